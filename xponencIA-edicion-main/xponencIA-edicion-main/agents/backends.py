@@ -0,0 +1,108 @@
+# agents/backends.py = Motores de transcripción intercambiables
+
+#--------------------------------------
+# Objetivos:
+# - Separar el transcriptor del motor: openai-whisper o faster-whisper (CTranslate2).
+# - faster-whisper permite cuantizar (int8, float16), decodificar en lotes y fijar hilos de CPU.
+# - Todos los motores devuelven el mismo esquema que whisper.transcribe():
+#   {"text", "segments": [{"id", "start", "end", "text", "words": [...]}]}
+
+BACKENDS = ("whisper", "faster-whisper")
+DEFAULT_BACKEND = "whisper"
+
+# --- OPCIONES DE faster-whisper ---
+BEAM_SIZE = 5
+BATCH_SIZE = 8       # 1 = decodificación secuencial (sin BatchedInferencePipeline)
+CPU_THREADS = 0      # 0 = lo decide CTranslate2
+
+
+def _resolver_dispositivo(device: str | None) -> str:
+    if device:
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _resolver_fp16(device: str, fp16: bool | None) -> bool:
+    # Whisper solo usa fp16 en GPU; en CPU lo fuerza a fp32 igualmente
+    if fp16 is None:
+        return device != "cpu"
+    return fp16 and device != "cpu"
+
+
+class WhisperBackend:
+    """openai-whisper en PyTorch (el motor original)."""
+    nombre = "whisper"
+
+    def __init__(self, model_size: str, device: str | None = None, fp16: bool | None = None, language: str = "es"):
+        import whisper
+        self.device = _resolver_dispositivo(device)
+        self.fp16 = _resolver_fp16(self.device, fp16)
+        self.language = language
+        self.modelo = whisper.load_model(model_size, device=self.device)
+
+    def describir(self) -> str:
+        return f"{self.device}, fp16={self.fp16}"
+
+    def transcribe(self, audio, word_timestamps: bool = False) -> dict:
+        return self.modelo.transcribe(audio, language=self.language, fp16=self.fp16,
+                                      word_timestamps=word_timestamps)
+
+
+class FasterWhisperBackend:
+    """faster-whisper sobre CTranslate2: mucho más rápido en CPU con int8."""
+    nombre = "faster-whisper"
+
+    def __init__(self, model_size: str, device: str | None = None, fp16: bool | None = None, language: str = "es",
+                 compute_type: str | None = None, beam_size: int = BEAM_SIZE, batch_size: int = BATCH_SIZE,
+                 cpu_threads: int = CPU_THREADS):
+        import ctranslate2
+        from faster_whisper import WhisperModel, BatchedInferencePipeline
+
+        if device is None:
+            device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        self.device = device
+        # Sin compute_type explícito: float16 en GPU (o el que pida fp16) e int8 en CPU
+        if compute_type is None:
+            compute_type = "float16" if device != "cpu" and fp16 is not False else "int8"
+        self.compute_type = compute_type
+        self.language = language
+        self.beam_size = beam_size
+        self.batch_size = batch_size
+
+        self.modelo = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        self._pipeline = BatchedInferencePipeline(model=self.modelo) if batch_size > 1 else None
+
+    def describir(self) -> str:
+        return f"{self.device}, {self.compute_type}, beam={self.beam_size}, batch={self.batch_size}"
+
+    def transcribe(self, audio, word_timestamps: bool = False) -> dict:
+        opciones = dict(language=self.language, beam_size=self.beam_size, word_timestamps=word_timestamps)
+        if self._pipeline is not None:
+            segmentos, _ = self._pipeline.transcribe(audio, batch_size=self.batch_size, **opciones)
+        else:
+            segmentos, _ = self.modelo.transcribe(audio, **opciones)
+
+        # faster-whisper devuelve un generador de objetos: se pasa al esquema de openai-whisper
+        segments = []
+        for i, seg in enumerate(segmentos):
+            segmento = {"id": i, "start": seg.start, "end": seg.end, "text": seg.text}
+            if seg.words:
+                segmento["words"] = [
+                    {"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                    for w in seg.words
+                ]
+            segments.append(segmento)
+        return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+
+def crear_backend(nombre: str, model_size: str, device: str | None = None, fp16: bool | None = None,
+                  language: str = "es", **opciones):
+    """Instancia el motor pedido. `opciones` son las propias de cada motor (compute_type, beam_size...)."""
+    if nombre == "whisper":
+        if opciones:
+            raise ValueError(f"El motor whisper no acepta las opciones: {', '.join(opciones)}")
+        return WhisperBackend(model_size, device, fp16, language)
+    if nombre == "faster-whisper":
+        return FasterWhisperBackend(model_size, device, fp16, language, **opciones)
+    raise ValueError(f"Motor de transcripción no soportado: {nombre}. Opciones: {', '.join(BACKENDS)}")
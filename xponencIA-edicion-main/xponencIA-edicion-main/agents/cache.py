@@ -0,0 +1,105 @@
+# agents/cache.py = Caché de resultados direccionada por contenido
+
+#--------------------------------------
+# Objetivos:
+# - Identificar cada archivo de entrada por una huella rápida de su contenido.
+# - Reutilizar transcripciones, dossiers y planes cuando nada relevante cambió.
+# - Mantener el tamaño acotado expulsando primero lo menos usado (LRU).
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+from agents.metricas import contar
+
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Bloques que se leen de cada archivo para la huella (inicio, medio y final)
+FINGERPRINT_BLOCK = 1024 * 1024
+
+
+def huella_archivo(path: str) -> str:
+    """Huella parcial: tamaño + mtime + sha256 de tres bloques de 1 MiB.
+
+    Evita leer entero un máster de 20 GB y cambia si se reemplaza o edita el archivo.
+    """
+    st = os.stat(path)
+    h = hashlib.sha256()
+    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(path, "rb") as f:
+        for offset in (0, max(0, st.st_size // 2 - FINGERPRINT_BLOCK // 2), max(0, st.st_size - FINGERPRINT_BLOCK)):
+            f.seek(offset)
+            h.update(f.read(FINGERPRINT_BLOCK))
+    return h.hexdigest()
+
+
+def hash_texto(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def clave_cache(etapa: str, huella: str, **params) -> str:
+    """Combina la etapa, la huella del archivo y los parámetros que afectan al resultado."""
+    material = json.dumps({"etapa": etapa, "huella": huella, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hash_texto(material)
+
+
+class CacheResultados:
+    """Caché en disco de resultados JSON, un archivo por clave.
+
+    El mtime de cada entrada marca su último uso; al superar `max_bytes` se
+    borran las entradas más antiguas.
+    """
+
+    def __init__(self, directorio: str, max_bytes: int = CACHE_MAX_BYTES):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def get(self, clave: str):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            contar("cache.fallos")
+            return None
+        contar("cache.aciertos")
+        # Marcar como usado recientemente
+        os.utime(ruta, None)
+        return datos
+
+    def put(self, clave: str, datos) -> None:
+        # Escritura atómica: nunca queda una entrada a medio escribir
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(tmp, self._ruta(clave))
+        self._expulsar()
+
+    def _expulsar(self) -> None:
+        with self._lock:
+            entradas = []
+            for nombre in os.listdir(self.directorio):
+                if not nombre.endswith(".json"):
+                    continue
+                ruta = os.path.join(self.directorio, nombre)
+                try:
+                    st = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, ruta))
+
+            total = sum(size for _, size, _ in entradas)
+            for _, size, ruta in sorted(entradas):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    pass
+                total -= size
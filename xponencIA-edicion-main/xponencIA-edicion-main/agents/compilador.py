@@ -0,0 +1,154 @@
+# agents/compilador.py = Compilador de planes de edición a archivos de intercambio
+
+#--------------------------------------
+# Objetivos:
+# - Convertir los segmentos del plan en una timeline completa (EDL CMX3600 o FCPXML).
+# - Incluir los puntos de corte y los marcadores para importarlos en una sola operación.
+# - Funcionar sin Resolve abierto (nodos de render, servidores).
+# - Salida determinista y con timecode exacto al frame para el frame rate del proyecto.
+
+import os
+import json
+from fractions import Fraction
+from urllib.parse import quote
+from xml.sax.saxutils import quoteattr
+
+from agents.timecode import (
+    fps_exacto, es_drop_frame, segundos_a_frames, frames_a_timecode, timecode_a_frames
+)
+
+FPS_DEFAULT = 25
+# Timecode de inicio de la timeline (convención de Resolve)
+RECORD_START_TC = "01:00:00:00"
+
+FORMATOS = ("edl", "fcpxml")
+
+
+# --- PLAN -> TIMELINE ---
+
+def puntos_de_corte(segments: list[dict], fps, duracion_frames: int) -> list[int]:
+    """Frames de corte ordenados y sin repetir, incluyendo el inicio y el final."""
+    puntos = {0, duracion_frames}
+    for seg in segments:
+        for clave in ("start", "end"):
+            frame = segundos_a_frames(seg[clave], fps)
+            if 0 < frame < duracion_frames:
+                puntos.add(frame)
+    return sorted(puntos)
+
+
+def marcadores(segments: list[dict], fps, duracion_frames: int) -> list[tuple[int, str, str]]:
+    """(frame, color, nombre) para el inicio y fin de cada segmento; uno por frame."""
+    por_frame = {}
+    for i, seg in enumerate(segments):
+        for clave, color, nombre in (("start", "Green", f"Inicio {i+1}"), ("end", "Red", f"Fin {i+1}")):
+            frame = min(segundos_a_frames(seg[clave], fps), max(duracion_frames - 1, 0))
+            por_frame.setdefault(frame, (color, nombre))
+    return [(frame, *por_frame[frame]) for frame in sorted(por_frame)]
+
+
+def compilar_edl(segments: list[dict], fps, duracion_s: float, nombre_clip: str, titulo: str) -> str:
+    """Timeline CMX3600: el clip completo partido en cada punto de corte, con marcadores."""
+    drop = es_drop_frame(fps)
+    duracion_frames = segundos_a_frames(duracion_s, fps)
+    record_inicio = timecode_a_frames(RECORD_START_TC, fps, drop)
+    tc = lambda f: frames_a_timecode(f, fps, drop)
+
+    lineas = [f"TITLE: {titulo}", f"FCM: {'DROP FRAME' if drop else 'NON-DROP FRAME'}", ""]
+    cortes = puntos_de_corte(segments, fps, duracion_frames)
+    marcas = marcadores(segments, fps, duracion_frames)
+
+    for evento, (desde, hasta) in enumerate(zip(cortes, cortes[1:]), start=1):
+        lineas.append(
+            f"{evento:03}  AX       V     C        "
+            f"{tc(desde)} {tc(hasta)} {tc(record_inicio + desde)} {tc(record_inicio + hasta)}"
+        )
+        lineas.append(f"* FROM CLIP NAME: {nombre_clip}")
+        for frame, color, nombre in marcas:
+            if desde <= frame < hasta:
+                lineas.append(f"* LOC: {tc(record_inicio + frame)} {color.upper():<7} {nombre}")
+        lineas.append("")
+    return "\n".join(lineas)
+
+
+def _rt(frames: int, fps) -> str:
+    # Tiempo racional de FCPXML: frames * duración de un frame, en segundos
+    valor = Fraction(frames) / fps_exacto(fps)
+    return f"{valor.numerator}s" if valor.denominator == 1 else f"{valor.numerator}/{valor.denominator}s"
+
+
+def compilar_fcpxml(segments: list[dict], fps, duracion_s: float, nombre_clip: str, titulo: str,
+                    ruta_fuente: str) -> str:
+    """FCPXML 1.9 con un asset-clip por tramo entre cortes y los marcadores dentro de cada uno."""
+    duracion_frames = segundos_a_frames(duracion_s, fps)
+    record_inicio = timecode_a_frames(RECORD_START_TC, fps, es_drop_frame(fps))
+    frame_dur = _rt(1, fps)
+    cortes = puntos_de_corte(segments, fps, duracion_frames)
+    marcas = marcadores(segments, fps, duracion_frames)
+    src = "file://" + quote(os.path.abspath(ruta_fuente).replace("\\", "/"))
+
+    lineas = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        "<!DOCTYPE fcpxml>",
+        '<fcpxml version="1.9">',
+        "    <resources>",
+        f'        <format id="r1" frameDuration="{frame_dur}"/>',
+        f'        <asset id="r2" name={quoteattr(nombre_clip)} start="0s" duration="{_rt(duracion_frames, fps)}" '
+        f'hasVideo="1" hasAudio="1" format="r1">',
+        f'            <media-rep kind="original-media" src={quoteattr(src)}/>',
+        "        </asset>",
+        "    </resources>",
+        "    <library>",
+        f"        <event name={quoteattr(titulo)}>",
+        f"            <project name={quoteattr(titulo)}>",
+        f'                <sequence format="r1" duration="{_rt(duracion_frames, fps)}" '
+        f'tcStart="{_rt(record_inicio, fps)}" tcFormat="{"DF" if es_drop_frame(fps) else "NDF"}">',
+        "                    <spine>",
+    ]
+    for desde, hasta in zip(cortes, cortes[1:]):
+        lineas.append(
+            f'                        <asset-clip ref="r2" name={quoteattr(nombre_clip)} offset="{_rt(record_inicio + desde, fps)}" '
+            f'start="{_rt(desde, fps)}" duration="{_rt(hasta - desde, fps)}">'
+        )
+        for frame, color, nombre in marcas:
+            if desde <= frame < hasta:
+                lineas.append(
+                    f'                            <marker start="{_rt(frame, fps)}" duration="{frame_dur}" '
+                    f'value={quoteattr(nombre)} note={quoteattr(color)}/>'
+                )
+        lineas.append("                        </asset-clip>")
+    lineas += [
+        "                    </spine>",
+        "                </sequence>",
+        "            </project>",
+        "        </event>",
+        "    </library>",
+        "</fcpxml>",
+        "",
+    ]
+    return "\n".join(lineas)
+
+
+def exportar_plan(plan_path: str, ruta_fuente: str, duracion_s: float, formato: str = "edl",
+                  fps=FPS_DEFAULT) -> str:
+    """Compila los segmentos de un *_edit_plan.json y guarda el archivo junto al plan."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}. Opciones: {', '.join(FORMATOS)}")
+
+    with open(plan_path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    segments = plan["plan_de_edicion"][0].get("segments", []) if plan["plan_de_edicion"] else []
+
+    nombre_clip = os.path.basename(ruta_fuente)
+    titulo = os.path.splitext(nombre_clip)[0]
+    if formato == "edl":
+        contenido = compilar_edl(segments, fps, duracion_s, nombre_clip, titulo)
+    else:
+        contenido = compilar_fcpxml(segments, fps, duracion_s, nombre_clip, titulo, ruta_fuente)
+
+    salida = plan_path.replace("_edit_plan.json", f"_timeline.{formato}")
+    # newline="" para que el archivo sea idéntico en Windows y Linux
+    with open(salida, "w", encoding="utf-8", newline="") as f:
+        f.write(contenido)
+    print(f"🎞️ Timeline {formato.upper()} guardada en: {salida}")
+    return salida
@@ -0,0 +1,212 @@
+# agents/cues_columnar.py = Subtítulos en columnas NumPy para procesamiento por lotes
+
+#--------------------------------------
+# Objetivos:
+# - Representar miles de cues como arreglos: inicio/fin en ms y el texto en un solo buffer.
+# - Aplicar las operaciones de tiempo sobre todos los cues a la vez (sin bucles por cue).
+# - Reportar líneas demasiado largas sin imprimir una línea por subtítulo.
+
+import os
+import numpy as np
+
+from agents.subtitulos import Cue, iter_cues, escribir_cues, CENSURA_RE
+from agents.timecode import fps_exacto
+
+# Separador de líneas dentro del buffer de texto
+_SALTO = "\n"
+
+
+def _empaquetar(textos: list[str]) -> tuple[str, np.ndarray]:
+    # Un solo buffer con todos los textos y los offsets de inicio de cada uno (más el final)
+    offsets = np.zeros(len(textos) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in textos], out=offsets[1:])
+    return "".join(textos), offsets
+
+
+class TablaCues:
+    """Cues en formato columnar.
+
+    inicio, fin: int64 en milisegundos.
+    texto: todos los textos concatenados; el cue i ocupa texto[offsets[i]:offsets[i+1]]
+    y sus líneas van separadas por "\\n".
+    """
+    __slots__ = ("inicio", "fin", "texto", "offsets")
+
+    def __init__(self, inicio, fin, texto, offsets):
+        self.inicio = np.asarray(inicio, dtype=np.int64)
+        self.fin = np.asarray(fin, dtype=np.int64)
+        self.texto = texto
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.inicio)
+
+    # --- Conversión desde/hacia cues ---
+
+    @classmethod
+    def desde_cues(cls, cues):
+        inicios, fines, textos = [], [], []
+        for cue in cues:
+            inicios.append(cue.inicio)
+            fines.append(cue.fin)
+            textos.append(_SALTO.join(cue.lineas))
+        return cls(inicios, fines, *_empaquetar(textos))
+
+    @classmethod
+    def leer(cls, ruta_archivo):
+        return cls.desde_cues(iter_cues(ruta_archivo))
+
+    def texto_de(self, i):
+        return self.texto[self.offsets[i]:self.offsets[i + 1]]
+
+    def cues(self):
+        for i in range(len(self)):
+            yield Cue(None, int(self.inicio[i]), int(self.fin[i]), self.texto_de(i).split(_SALTO))
+
+    def guardar(self, ruta_salida, formato=None):
+        return escribir_cues(self.cues(), ruta_salida, formato)
+
+    def _con_tiempos(self, inicio, fin):
+        return TablaCues(inicio, fin, self.texto, self.offsets)
+
+    # --- Operaciones de tiempo vectorizadas ---
+
+    def desplazar(self, ms):
+        """Corre todos los cues `ms` milisegundos (negativo = antes), sin bajar de 0."""
+        return self._con_tiempos(np.maximum(self.inicio + ms, 0), np.maximum(self.fin + ms, 0))
+
+    def retemporizar(self, fps_origen, fps_destino):
+        """Reescala los tiempos al cambiar de frame rate (ej. 25 -> 23.976 tras un pulldown)."""
+        factor = fps_exacto(fps_origen) / fps_exacto(fps_destino)
+        # Aritmética entera con la fracción exacta: sin error acumulado en archivos largos
+        num, den = factor.numerator, factor.denominator
+        escalar = lambda t: (t * num + den // 2) // den
+        return self._con_tiempos(escalar(self.inicio), escalar(self.fin))
+
+    def corregir_solapes(self, gap_min_ms=0):
+        """Recorta el fin de cada cue para dejar al menos `gap_min_ms` antes del siguiente."""
+        orden = np.argsort(self.inicio, kind="stable")
+        tabla = self.reordenar(orden)
+        fin = tabla.fin.copy()
+        limite = tabla.inicio[1:] - gap_min_ms
+        fin[:-1] = np.minimum(fin[:-1], limite)
+        # Nunca antes del propio inicio
+        fin = np.maximum(fin, tabla.inicio)
+        return tabla._con_tiempos(tabla.inicio, fin)
+
+    def ajustar_duracion(self, min_ms=None, max_ms=None):
+        """Fuerza la duración de cada cue a [min_ms, max_ms] moviendo el fin.
+
+        Al alargar no se invade el cue siguiente; el recorte a `max_ms` se respeta siempre.
+        """
+        tabla = self.reordenar(np.argsort(self.inicio, kind="stable"))
+        duracion = tabla.fin - tabla.inicio
+        if min_ms is not None:
+            duracion = np.maximum(duracion, min_ms)
+        if max_ms is not None:
+            duracion = np.minimum(duracion, max_ms)
+        fin = tabla.inicio + duracion
+        if len(tabla) > 1 and min_ms is not None:
+            # Solo los cues que se alargaron vuelven atrás: como mucho hasta el siguiente
+            # (o hasta su fin original, si ya lo invadía)
+            extendido = fin > tabla.fin
+            siguiente = np.append(tabla.inicio[1:], np.iinfo(np.int64).max)
+            fin = np.where(extendido & (fin > siguiente), np.maximum(siguiente, tabla.fin), fin)
+        return tabla._con_tiempos(tabla.inicio, fin)
+
+    def reordenar(self, orden):
+        """Nueva tabla con los cues en el orden dado (el buffer de texto se reconstruye)."""
+        if np.array_equal(orden, np.arange(len(self))):
+            return self
+        textos = [self.texto_de(i) for i in orden]
+        return TablaCues(self.inicio[orden], self.fin[orden], *_empaquetar(textos))
+
+    # --- División proporcional (censuras) ---
+
+    def dividir_censuras(self):
+        """Parte cada cue en los marcadores ## en tramos iguales, calculados en bloque.
+
+        Solo la búsqueda del patrón es por cue; los tiempos de todas las partes se
+        calculan con una sola operación vectorizada.
+        """
+        partes_por_cue = []
+        textos = []
+        for i in range(len(self)):
+            texto = self.texto_de(i)
+            if "##" in texto:
+                partes = [p.strip() for p in CENSURA_RE.split(texto.replace(_SALTO, " "))]
+                partes = [p for p in partes if p] or [texto]
+            else:
+                partes = [texto]
+            partes_por_cue.append(len(partes))
+            textos.extend(partes)
+
+        n = np.asarray(partes_por_cue, dtype=np.int64)
+        cue = np.repeat(np.arange(len(self)), n)
+        # k = posición de la parte dentro de su cue
+        k = np.arange(len(cue)) - np.repeat(np.cumsum(n) - n, n)
+        duracion = (self.fin - self.inicio)[cue]
+        base = self.inicio[cue]
+        inicio = base + duracion * k // n[cue]
+        fin = base + duracion * (k + 1) // n[cue]
+
+        return TablaCues(inicio, fin, *_empaquetar(textos))
+
+    # --- Reporte de longitud de línea ---
+
+    def reporte_longitud(self, max_chars):
+        """Devuelve un resumen y la lista de (cue, línea, largo) que exceden `max_chars`.
+
+        Los largos de línea salen de las posiciones de los saltos en el buffer,
+        sin recorrer las líneas en Python.
+        """
+        codigos = np.frombuffer(self.texto.encode("utf-32-le"), dtype=np.uint32)
+        saltos = np.flatnonzero(codigos == ord(_SALTO))
+        # Cada cue termina una "línea" en su offset final; los saltos internos cortan las demás
+        finales = np.union1d(saltos, self.offsets[1:])
+        inicios_linea = np.concatenate(([0], finales[:-1] + np.isin(finales[:-1], saltos)))
+        largos = finales - inicios_linea
+        cue_de_linea = np.searchsorted(self.offsets, inicios_linea, side="right") - 1
+
+        # Los cues vacíos generan líneas de largo 0 que no interesan
+        exceden = np.flatnonzero(largos > max_chars)
+        violaciones = [
+            (int(cue_de_linea[j]), self.texto[inicios_linea[j]:finales[j]], int(largos[j]))
+            for j in exceden
+        ]
+        resumen = {
+            "cues": len(self),
+            "lineas": int(np.count_nonzero(largos)),
+            "lineas_excedidas": len(violaciones),
+            "cues_con_exceso": int(len(np.unique(cue_de_linea[exceden]))),
+            "largo_maximo": int(largos.max()) if len(largos) else 0,
+        }
+        return resumen, violaciones
+
+
+# ==============================================================================
+# PROCESAMIENTO DE LOTES DE ARCHIVOS
+# ==============================================================================
+
+def procesar_archivos(rutas, dir_salida, desplazar_ms=0, fps=None, gap_min_ms=None,
+                      min_ms=None, max_ms=None, max_chars=None):
+    """Aplica las mismas operaciones a muchos SRT/VTT y devuelve un reporte por archivo.
+
+    `fps` es un par (fps_origen, fps_destino) para retemporizar.
+    """
+    os.makedirs(dir_salida, exist_ok=True)
+    reportes = {}
+    for ruta in rutas:
+        tabla = TablaCues.leer(ruta)
+        if fps:
+            tabla = tabla.retemporizar(*fps)
+        if desplazar_ms:
+            tabla = tabla.desplazar(desplazar_ms)
+        if min_ms is not None or max_ms is not None:
+            tabla = tabla.ajustar_duracion(min_ms, max_ms)
+        if gap_min_ms is not None:
+            tabla = tabla.corregir_solapes(gap_min_ms)
+        tabla.guardar(os.path.join(dir_salida, os.path.basename(ruta)))
+        if max_chars:
+            reportes[ruta], _ = tabla.reporte_longitud(max_chars)
+    return reportes
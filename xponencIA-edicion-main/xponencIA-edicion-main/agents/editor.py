@@ -2,43 +2,193 @@
 
 #--------------------------------------
 # Objetivos:
-# - Conectar al proyecto y la timeline.
+# - Conectar al proyecto y elegir (o crear) la timeline de cada archivo.
 # - Agregar marcadores en base a timestamps.
 # - Hacer cortes en base a pares inicio/fin.
+# - Hacerlo con una sola conexión y en lote: cada llamada al puente de Resolve es lenta.
 
+import os
 
-import DaVinciResolveScript as dvr
+from agents.timecode import fps_exacto, segundos_a_frames
+from agents.metricas import span, contar
 
-def conectar_resolve():
+
+# Nota con la que se crean los marcadores: distingue los del pipeline de los que puso el editor
+NOTA_MARCADOR = "xponencIA"
+
+
+def conectar_resolve(dvr=None):
+    # dvr se puede inyectar (por ejemplo un módulo falso que registra las llamadas)
+    if dvr is None:
+        import DaVinciResolveScript as dvr
+    contar("resolve.llamadas")
     resolve = dvr.scriptapp("Resolve")
     if not resolve:
         raise Exception("❌ No se pudo conectar a DaVinci Resolve.")
     return resolve
 
-def agregar_marcadores(timestamps, color="Blue"):
-    resolve = conectar_resolve()
-    proyecto = resolve.GetProjectManager().GetCurrentProject()
-    timeline = proyecto.GetCurrentTimeline()
-    
-    for ts in timestamps:
-        tiempo_seg = ts["time"]  # en segundos
-        nombre = ts.get("label", f"Marcador {ts['time']}")
-        timeline.AddMarker(tiempo_seg, color, nombre, "", 1)
-    print(f"✅ {len(timestamps)} marcadores creados.")
 
-def hacer_cortes(segments):
-    resolve = conectar_resolve()
-    proyecto = resolve.GetProjectManager().GetCurrentProject()
-    timeline = proyecto.GetCurrentTimeline()
-    
-    for seg in segments:
-        inicio = seg["start"]
-        fin = seg["end"]
-        timeline.AddMarker(inicio, "Green", "Inicio corte", "", 1)
-        timeline.AddMarker(fin, "Red", "Fin corte", "", 1)
-        timeline.Cut(inicio)  
-        timeline.Cut(fin)
-    print(f"✂️ {len(segments)} cortes aplicados.")
+class SesionResolve:
+    """Conexión única a Resolve con el proyecto, la timeline y el frame rate ya resueltos.
+
+    Los marcadores y cortes se aplican en lote: se convierten a frames, se
+    ordenan y se descartan los repetidos antes de llamar a la API.
+    Arranca sobre la timeline activa; usar_timeline() pasa a la de otro archivo.
+    `omitidos` cuenta los marcadores que no se pudieron poner porque el frame ya
+    tenía un marcador ajeno (o Resolve rechazó la llamada). Los de una corrida
+    anterior del pipeline (con NOTA_MARCADOR) se reemplazan.
+    """
+
+    def __init__(self, dvr=None):
+        with span("resolve.conectar"):
+            self.resolve = conectar_resolve(dvr)
+            self.proyecto = self._api(self._api(self.resolve.GetProjectManager).GetCurrentProject)
+            if not self.proyecto:
+                raise Exception("❌ No hay un proyecto activo en Resolve.")
+            timeline = self._api(self.proyecto.GetCurrentTimeline)
+            if not timeline:
+                raise Exception("❌ No hay una timeline activa en Resolve.")
+            self.omitidos = 0
+            self._cargar_timeline(timeline)
+
+    def _cargar_timeline(self, timeline):
+        self.timeline = timeline
+        fps = (self._api(self.timeline.GetSetting, "timelineFrameRate")
+               or self._api(self.proyecto.GetSetting, "timelineFrameRate"))
+        # Fracción exacta: 29.97 es 30000/1001 y no acumula error en sesiones largas
+        self.fps = fps_exacto(fps)
+        # Marcadores que ya hay en la timeline, por frame (Resolve admite uno por frame)
+        self._marcadores = {
+            int(f): (datos.get("name"), datos.get("note"))
+            for f, datos in (self._api(self.timeline.GetMarkers) or {}).items()
+        }
+        # Frames ya resueltos en esta sesión (marcador creado, ya presente o tapado por uno ajeno)
+        self._resueltos = set()
+
+    def _buscar_timeline(self, nombre: str):
+        if self._api(self.timeline.GetName) == nombre:
+            return self.timeline
+        for indice in range(1, (self._api(self.proyecto.GetTimelineCount) or 0) + 1):
+            timeline = self._api(self.proyecto.GetTimelineByIndex, indice)
+            if timeline and self._api(timeline.GetName) == nombre:
+                return timeline
+        return None
+
+    def _crear_timeline(self, nombre: str, media: str):
+        media_pool = self._api(self.proyecto.GetMediaPool)
+        clips = self._api(media_pool.ImportMedia, [os.path.abspath(media)])
+        if not clips:
+            raise Exception(f"❌ Resolve no pudo importar {media}.")
+        timeline = self._api(media_pool.CreateTimelineFromClips, nombre, clips)
+        if not timeline:
+            raise Exception(f"❌ No se pudo crear la timeline '{nombre}'.")
+        print(f"🎞️ Timeline '{nombre}' creada con {os.path.basename(media)}.")
+        return timeline
+
+    def usar_timeline(self, nombre: str, media: str | None = None, exigir: bool = False):
+        """Pasa a la timeline `nombre` del proyecto.
+
+        Si no existe: con `media` la crea con ese archivo; con `exigir` falla; si no,
+        sigue en la timeline activa (el caso de un solo archivo). Los marcadores se
+        vuelven a leer: cada plan arranca con el estado actual de la timeline.
+        """
+        with span("resolve.timeline", timeline=nombre):
+            timeline = self._buscar_timeline(nombre)
+            if timeline is None:
+                if media is not None:
+                    timeline = self._crear_timeline(nombre, media)
+                elif exigir:
+                    raise Exception(f"❌ No existe la timeline '{nombre}' en el proyecto.")
+                else:
+                    print(f"⚠️ No existe la timeline '{nombre}': se usa la timeline activa.")
+                    timeline = self.timeline
+            if timeline is not self.timeline and not self._api(self.proyecto.SetCurrentTimeline, timeline):
+                raise Exception(f"❌ No se pudo activar la timeline '{nombre}'.")
+            self._cargar_timeline(timeline)
+
+    @staticmethod
+    def _api(metodo, *args):
+        # Toda llamada al puente de Resolve pasa por acá para contarlas en las métricas
+        contar("resolve.llamadas")
+        return metodo(*args)
 
+    def a_frames(self, segundos: float) -> int:
+        return segundos_a_frames(float(segundos), self.fps)
 
+    def agregar_marcadores(self, timestamps, color="Blue"):
+        # Un marcador por frame: el primero que llega gana, el resto se descarta
+        lote = {}
+        reemplazar = set()
+        omitidos = 0
+        for ts in timestamps:
+            frame = self.a_frames(ts["time"])  # ts["time"] en segundos
+            nombre = ts.get("label", f"Marcador {ts['time']}")
+            if frame in lote or frame in self._resueltos:
+                continue
+            if frame in self._marcadores:
+                nombre_previo, nota_previa = self._marcadores[frame]
+                if nombre_previo == nombre:
+                    # El mismo marcador de una corrida anterior ya está puesto
+                    self._resueltos.add(frame)
+                    continue
+                if nota_previa != NOTA_MARCADOR:
+                    # Un marcador del editor tapa el frame: no se pisa
+                    self._resueltos.add(frame)
+                    omitidos += 1
+                    continue
+                # Marcador de un plan anterior de este archivo: se reemplaza
+                reemplazar.add(frame)
+            lote[frame] = (ts.get("color", color), nombre)
 
+        creados = 0
+        with span("resolve.marcadores", marcadores=len(lote)):
+            for frame in sorted(lote):
+                color_marcador, nombre = lote[frame]
+                if frame in reemplazar:
+                    self._api(self.timeline.DeleteMarkerAtFrame, frame)
+                if self._api(self.timeline.AddMarker, frame, color_marcador, nombre, NOTA_MARCADOR, 1):
+                    self._marcadores[frame] = (nombre, NOTA_MARCADOR)
+                    self._resueltos.add(frame)
+                    creados += 1
+                else:
+                    omitidos += 1
+        self.omitidos += omitidos
+        print(f"✅ {creados} marcadores creados ({len(timestamps) - creados - omitidos} repetidos, "
+              f"{omitidos} omitidos).")
+        return creados
+
+    def hacer_cortes(self, segments):
+        marcadores = []
+        frames_corte = set()
+        for seg in segments:
+            marcadores.append({"time": seg["start"], "label": "Inicio corte", "color": "Green"})
+            marcadores.append({"time": seg["end"], "label": "Fin corte", "color": "Red"})
+            frames_corte.add(self.a_frames(seg["start"]))
+            frames_corte.add(self.a_frames(seg["end"]))
+        self.agregar_marcadores(marcadores)
+
+        # Segmentos contiguos comparten frame de corte: se corta una sola vez
+        with span("resolve.cortes", cortes=len(frames_corte)):
+            for frame in sorted(frames_corte):
+                self._api(self.timeline.Cut, frame)
+        print(f"✂️ {len(segments)} cortes aplicados ({len(frames_corte)} puntos de corte).")
+        return len(frames_corte)
+
+
+# Sesión compartida por las funciones de módulo: se conecta con la primera llamada
+_sesion = None
+
+
+def obtener_sesion(dvr=None):
+    global _sesion
+    if _sesion is None:
+        _sesion = SesionResolve(dvr)
+    return _sesion
+
+
+def agregar_marcadores(timestamps, color="Blue"):
+    return obtener_sesion().agregar_marcadores(timestamps, color)
+
+
+def hacer_cortes(segments):
+    return obtener_sesion().hacer_cortes(segments)
@@ -0,0 +1,156 @@
+# agents/gemini_async.py = Cliente asíncrono para la API de archivos de Gemini
+
+#--------------------------------------
+# Objetivos:
+# - Subir, esperar, analizar y borrar archivos sin bloquear el hilo principal.
+# - Tener muchos archivos en vuelo a la vez, con un límite de concurrencia.
+# - Respetar un presupuesto de llamadas por minuto.
+# - Reemplazar las esperas fijas de 5 s por reintentos con backoff exponencial y jitter.
+
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+
+from config import configurar_gemini
+from agents.strategist import get_edit_plan_from_gemini, get_edit_plan_windowed
+from agents.metricas import span, contar
+
+MAX_CONCURRENCY = 4
+REQUESTS_PER_MINUTE = 60
+
+# Sondeo del estado PROCESSING
+POLL_INITIAL_S = 1.0
+POLL_MAX_S = 30.0
+POLL_FACTOR = 2.0
+POLL_TIMEOUT_S = 30 * 60
+
+
+def backoff_delay(intento: int, inicial: float = POLL_INITIAL_S, maximo: float = POLL_MAX_S,
+                  factor: float = POLL_FACTOR) -> float:
+    """Espera exponencial con jitter: entre la mitad y el total del tope del intento."""
+    tope = min(maximo, inicial * factor ** intento)
+    return random.uniform(tope / 2, tope)
+
+
+class RateLimiter:
+    """Token bucket asíncrono: como máximo `por_minuto` llamadas por minuto, con ráfagas."""
+
+    def __init__(self, por_minuto: int = REQUESTS_PER_MINUTE):
+        self.capacidad = float(por_minuto)
+        self.tokens = float(por_minuto)
+        self.por_segundo = por_minuto / 60.0
+        self._ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.por_segundo)
+                self._ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.por_segundo)
+
+
+class GeminiAsyncClient:
+    """Capa asíncrona sobre el SDK síncrono de google.generativeai.
+
+    Cada llamada al SDK corre en un hilo (asyncio.to_thread) y pasa por el
+    rate limiter; `process` acota cuántos archivos están en vuelo a la vez.
+    En el modo por ventanas cada pedido de ventana (y sus reintentos y el meta-análisis)
+    pasa por el mismo rate limiter, y entre todos los archivos no hay más de
+    `max_concurrency` generaciones simultáneas.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, requests_per_minute: int = REQUESTS_PER_MINUTE,
+                 windowed: bool = False):
+        # windowed=True usa el análisis por ventanas del estratega en lugar de una sola llamada
+        self.windowed = windowed
+        self.genai = configurar_gemini()
+        self._semaforo = asyncio.Semaphore(max_concurrency)
+        self._limiter = RateLimiter(requests_per_minute)
+        # Generaciones por ventana en curso, sumando todos los archivos
+        self._generaciones = threading.BoundedSemaphore(max_concurrency)
+
+    async def _call(self, fn, *args, **kwargs):
+        await self._limiter.acquire()
+        contar("gemini.llamadas")
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    @contextmanager
+    def _llamada_desde_hilo(self, loop):
+        # Para los pedidos que el estratega hace desde sus propios hilos: el token se pide
+        # al limiter del event loop y el hilo espera a tenerlo antes de llamar a la API
+        asyncio.run_coroutine_threadsafe(self._limiter.acquire(), loop).result()
+        contar("gemini.llamadas")
+        with self._generaciones:
+            yield
+
+    async def upload(self, path: str, display_name: str):
+        print(f"Subiendo {display_name} a la API de Gemini...")
+        with span("gemini.subida", archivo=display_name, bytes=os.path.getsize(path)):
+            file_response = await self._call(self.genai.upload_file, path=path, display_name=display_name)
+        print(f"Archivo subido. ID: {file_response.name}. Esperando a que esté ACTIVO...")
+        return file_response
+
+    async def wait_active(self, file_response, timeout_s: float = POLL_TIMEOUT_S):
+        limite = time.monotonic() + timeout_s
+        intento = 0
+        with span("gemini.espera_processing", archivo=file_response.display_name) as atributos:
+            while file_response.state.name == "PROCESSING":
+                if time.monotonic() > limite:
+                    raise TimeoutError(f"{file_response.display_name} sigue en PROCESSING tras {timeout_s:.0f} s")
+                await asyncio.sleep(backoff_delay(intento))
+                intento += 1
+                contar("gemini.sondeos")
+                file_response = await self._call(self.genai.get_file, name=file_response.name)
+                print(f"Estado actual de {file_response.display_name}: {file_response.state.name}")
+            atributos["sondeos"] = intento
+
+        if file_response.state.name != "ACTIVE":
+            raise Exception(f"La subida del archivo {file_response.display_name} falló. Estado final: {file_response.state.name}")
+        print(f"{file_response.display_name} está ACTIVO y listo para ser analizado.")
+        return file_response
+
+    async def analyze(self, dossier_data: dict, file_response, on_block=None, ventanas_previas=None,
+                      on_window=None) -> dict:
+        with span("gemini.generacion", archivo=file_response.display_name, ventanas=self.windowed):
+            if self.windowed:
+                loop = asyncio.get_running_loop()
+                return await asyncio.to_thread(get_edit_plan_windowed, dossier_data, file_response, on_block=on_block,
+                                               ventanas_previas=ventanas_previas, on_window=on_window,
+                                               llamada=lambda: self._llamada_desde_hilo(loop))
+            return await self._call(get_edit_plan_from_gemini, dossier_data, file_response, on_block=on_block)
+
+    async def delete(self, file_response) -> None:
+        print(f"Borrando {file_response.display_name} (ID: {file_response.name})...")
+        with span("gemini.borrado", archivo=file_response.display_name):
+            await self._call(self.genai.delete_file, file_response.name)
+
+    async def process(self, path: str, display_name: str, dossier_data: dict, on_block=None,
+                      on_upload=None, on_delete=None, ventanas_previas=None, on_window=None) -> dict:
+        """Sube, espera, analiza y borra un archivo. Siempre intenta borrar lo subido.
+
+        `on_block` se llama desde un hilo del SDK con cada bloque del plan apenas llega.
+        `on_upload(file_response)` y `on_delete(file_response)` permiten registrar la
+        subida, para borrarla en el próximo arranque si el proceso muere antes.
+        `ventanas_previas` y `on_window` se pasan al análisis por ventanas.
+        """
+        async with self._semaforo:
+            file_response = None
+            try:
+                file_response = await self.upload(path, display_name)
+                if on_upload is not None:
+                    on_upload(file_response)
+                file_response = await self.wait_active(file_response)
+                return await self.analyze(dossier_data, file_response, on_block, ventanas_previas, on_window)
+            finally:
+                if file_response:
+                    await self.delete(file_response)
+                    if on_delete is not None:
+                        on_delete(file_response)
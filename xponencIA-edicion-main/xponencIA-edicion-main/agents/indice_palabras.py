@@ -0,0 +1,273 @@
+# agents/indice_palabras.py = Índice de palabras de una transcripción
+
+#--------------------------------------
+# Objetivos:
+# - Consultar qué se dice entre t0 y t1 sin recorrer todos los segmentos (búsqueda binaria).
+# - Buscar frases con un índice invertido de tokens (sin acentos ni mayúsculas).
+# - Guardar el índice en un binario que se abre con mmap, junto a *_transcription.json.
+
+import os
+import mmap
+import struct
+import bisect
+import unicodedata
+import numpy as np
+
+from agents.timecode import segundos_a_ms, ms_a_segundos
+
+MAGIC = b"XPWIDX01"
+# magic, palabras, tokens, bytes de texto, bytes de vocabulario
+_CABECERA = struct.Struct("<8sIIII")
+
+
+def normalizar_token(palabra: str) -> str:
+    """"¿Qué?" -> "que": minúsculas, sin acentos ni puntuación."""
+    sin_acentos = unicodedata.normalize("NFKD", palabra.lower())
+    return "".join(c for c in sin_acentos if c.isalnum() or c == "#")
+
+
+def palabras_de_segmento(segmento: dict) -> list[tuple[str, int, int]]:
+    """(texto, inicio_ms, fin_ms) por palabra.
+
+    Usa los word timestamps de Whisper si existen; si no, reparte el tiempo del
+    segmento en proporción a la cantidad de caracteres de cada palabra.
+    """
+    palabras = segmento.get("words")
+    if palabras:
+        return [
+            (p["word"].strip(), segundos_a_ms(p["start"]), segundos_a_ms(p["end"]))
+            for p in palabras if p["word"].strip()
+        ]
+
+    textos = segmento.get("text", "").split()
+    if not textos:
+        return []
+    inicio, fin = segundos_a_ms(segmento["start"]), segundos_a_ms(segmento["end"])
+    pesos = [len(t) for t in textos]
+    total = sum(pesos)
+    resultado, acumulado = [], 0
+    for texto, peso in zip(textos, pesos):
+        desde = inicio + (fin - inicio) * acumulado // total
+        acumulado += peso
+        resultado.append((texto, desde, inicio + (fin - inicio) * acumulado // total))
+    return resultado
+
+
+def ruta_indice(transcription_path: str) -> str:
+    return transcription_path.replace("_transcription.json", "_transcription.idx")
+
+
+def _offsets(largos) -> np.ndarray:
+    offsets = np.zeros(len(largos) + 1, dtype=np.uint32)
+    np.cumsum(largos, out=offsets[1:])
+    return offsets
+
+
+def _alinear(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class _Cadenas:
+    """Vista de solo lectura sobre un blob UTF-8 con offsets: se puede indexar y usar con bisect."""
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+class IndicePalabras:
+    """Palabras ordenadas por inicio, con su segmento y un índice invertido por token.
+
+    Columnas (una fila por palabra): inicio y fin en ms, id de token y número de
+    segmento. El vocabulario está ordenado, así un token se encuentra con bisect,
+    y `postings[token]` son las posiciones donde aparece.
+    """
+    __slots__ = ("inicio", "fin", "token", "segmento", "textos", "vocab",
+                 "postings_offsets", "postings", "_mmap")
+
+    def __init__(self, inicio, fin, token, segmento, textos, vocab, postings_offsets, postings, _mmap=None):
+        self.inicio = inicio
+        self.fin = fin
+        self.token = token
+        self.segmento = segmento
+        self.textos = textos
+        self.vocab = vocab
+        self.postings_offsets = postings_offsets
+        self.postings = postings
+        self._mmap = _mmap
+
+    def __len__(self):
+        return len(self.inicio)
+
+    # --- Construcción ---
+
+    @classmethod
+    def construir(cls, segmentos: list[dict]) -> "IndicePalabras":
+        filas = [
+            (desde, hasta, texto, n)
+            for n, segmento in enumerate(segmentos)
+            for texto, desde, hasta in palabras_de_segmento(segmento)
+        ]
+        # Orden estable por inicio: Whisper casi siempre ya las entrega en orden
+        filas.sort(key=lambda f: f[0])
+
+        tokens = [normalizar_token(f[2]) for f in filas]
+        vocab = sorted(set(tokens))
+        id_de = {t: i for i, t in enumerate(vocab)}
+        token = np.fromiter((id_de[t] for t in tokens), dtype=np.uint32, count=len(tokens))
+
+        # Índice invertido: posiciones agrupadas por token (argsort estable = posiciones crecientes)
+        postings = np.argsort(token, kind="stable").astype(np.uint32)
+        postings_offsets = _offsets(np.bincount(token, minlength=len(vocab)))
+
+        textos = [f[2].encode("utf-8") for f in filas]
+        vocab_bytes = [t.encode("utf-8") for t in vocab]
+        return cls(
+            np.fromiter((f[0] for f in filas), dtype=np.int32, count=len(filas)),
+            np.fromiter((f[1] for f in filas), dtype=np.int32, count=len(filas)),
+            token,
+            np.fromiter((f[3] for f in filas), dtype=np.uint32, count=len(filas)),
+            _Cadenas(b"".join(textos), _offsets([len(t) for t in textos])),
+            _Cadenas(b"".join(vocab_bytes), _offsets([len(t) for t in vocab_bytes])),
+            postings_offsets,
+            postings,
+        )
+
+    # --- Persistencia ---
+
+    def guardar(self, ruta: str) -> str:
+        """Escribe el índice en un binario little-endian con secciones alineadas a 8 bytes."""
+        secciones = [
+            self.inicio.astype("<i4"), self.fin.astype("<i4"),
+            self.token.astype("<u4"), self.segmento.astype("<u4"),
+            np.asarray(self.textos.offsets, dtype="<u4"), bytes(self.textos.blob),
+            np.asarray(self.vocab.offsets, dtype="<u4"), bytes(self.vocab.blob),
+            np.asarray(self.postings_offsets, dtype="<u4"), np.asarray(self.postings, dtype="<u4"),
+        ]
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(_CABECERA.pack(MAGIC, len(self), len(self.vocab), len(self.textos.blob), len(self.vocab.blob)))
+            for seccion in secciones:
+                datos = seccion.tobytes() if isinstance(seccion, np.ndarray) else seccion
+                f.write(datos)
+                f.write(b"\0" * (_alinear(len(datos)) - len(datos)))
+        os.replace(temporal, ruta)
+        return ruta
+
+    @classmethod
+    def abrir(cls, ruta: str) -> "IndicePalabras":
+        """Abre el índice con mmap: las columnas se leen del disco recién al consultarlas."""
+        with open(ruta, "rb") as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, t, bytes_texto, bytes_vocab = _CABECERA.unpack_from(mapa, 0)
+        if magic != MAGIC:
+            mapa.close()
+            raise ValueError(f"{ruta} no es un índice de palabras válido.")
+
+        posicion = _CABECERA.size
+        memoria = memoryview(mapa)
+
+        def leer(dtype, cantidad):
+            nonlocal posicion
+            arreglo = np.frombuffer(mapa, dtype=dtype, count=cantidad, offset=posicion)
+            posicion += _alinear(arreglo.nbytes)
+            return arreglo
+
+        def leer_bytes(cantidad):
+            nonlocal posicion
+            blob = memoria[posicion:posicion + cantidad]
+            posicion += _alinear(cantidad)
+            return blob
+
+        inicio, fin = leer("<i4", n), leer("<i4", n)
+        token, segmento = leer("<u4", n), leer("<u4", n)
+        textos = _Cadenas(None, leer("<u4", n + 1))
+        textos.blob = leer_bytes(bytes_texto)
+        vocab = _Cadenas(None, leer("<u4", t + 1))
+        vocab.blob = leer_bytes(bytes_vocab)
+        postings_offsets, postings = leer("<u4", t + 1), leer("<u4", n)
+        return cls(inicio, fin, token, segmento, textos, vocab, postings_offsets, postings, _mmap=mapa)
+
+    # --- Consultas ---
+
+    def _palabra(self, i: int) -> dict:
+        return {
+            "word": self.textos[i],
+            "start": ms_a_segundos(int(self.inicio[i])),
+            "end": ms_a_segundos(int(self.fin[i])),
+            "segment": int(self.segmento[i]),
+        }
+
+    def rango(self, t0: float, t1: float) -> tuple[int, int]:
+        """Posiciones [desde, hasta) de las palabras que se solapan con [t0, t1] (segundos)."""
+        ms0, ms1 = segundos_a_ms(t0), segundos_a_ms(t1)
+        desde = int(np.searchsorted(self.inicio, ms0, side="left"))
+        hasta = int(np.searchsorted(self.inicio, ms1, side="left"))
+        # La palabra anterior puede empezar antes de t0 y seguir sonando
+        if desde > 0 and self.fin[desde - 1] > ms0:
+            desde -= 1
+        return desde, hasta
+
+    def palabras_en(self, t0: float, t1: float) -> list[dict]:
+        desde, hasta = self.rango(t0, t1)
+        return [self._palabra(i) for i in range(desde, hasta)]
+
+    def texto_en(self, t0: float, t1: float) -> str:
+        desde, hasta = self.rango(t0, t1)
+        return " ".join(self.textos[i] for i in range(desde, hasta))
+
+    def segmentos_en(self, t0: float, t1: float) -> list[int]:
+        """Índices de los segmentos de Whisper (dialogue_segments) con palabras en [t0, t1]."""
+        desde, hasta = self.rango(t0, t1)
+        return sorted(set(self.segmento[desde:hasta].tolist()))
+
+    def _id_token(self, token: str) -> int | None:
+        i = bisect.bisect_left(self.vocab, token)
+        return i if i < len(self.vocab) and self.vocab[i] == token else None
+
+    def buscar_frase(self, frase: str) -> list[dict]:
+        """Apariciones de `frase` (palabras consecutivas), con su inicio y fin en segundos."""
+        tokens = [normalizar_token(p) for p in frase.split()]
+        tokens = [t for t in tokens if t]
+        ids = [self._id_token(t) for t in tokens]
+        if not ids or None in ids:
+            return []
+
+        # Candidatas: posiciones del primer token; se filtran con el resto por desplazamiento
+        candidatas = self.postings[self.postings_offsets[ids[0]]:self.postings_offsets[ids[0] + 1]].astype(np.int64)
+        candidatas = candidatas[candidatas + len(ids) <= len(self)]
+        for k, id_token in enumerate(ids[1:], start=1):
+            candidatas = candidatas[self.token[candidatas + k] == id_token]
+
+        ultimo = len(ids) - 1
+        return [
+            {
+                "start": ms_a_segundos(int(self.inicio[i])),
+                "end": ms_a_segundos(int(self.fin[i + ultimo])),
+                "text": " ".join(self.textos[j] for j in range(i, i + ultimo + 1)),
+                "segment": int(self.segmento[i]),
+            }
+            for i in candidatas.tolist()
+        ]
+
+    def cerrar(self):
+        if self._mmap is not None:
+            # Las vistas numpy retienen el buffer: se sueltan antes de cerrar el mapa
+            self.inicio = self.fin = self.token = self.segmento = None
+            self.textos = self.vocab = self.postings_offsets = self.postings = None
+            self._mmap.close()
+            self._mmap = None
+
+
+def indexar_transcripcion(segmentos: list[dict], transcription_path: str) -> str:
+    """Construye el índice de palabras y lo guarda junto a *_transcription.json."""
+    ruta = IndicePalabras.construir(segmentos).guardar(ruta_indice(transcription_path))
+    print(f"--- [Índice] Índice de palabras guardado en: {ruta} ---")
+    return ruta
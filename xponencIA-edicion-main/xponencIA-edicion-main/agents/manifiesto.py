@@ -0,0 +1,166 @@
+# agents/manifiesto.py = Manifiesto por archivo para reanudar el pipeline
+
+#--------------------------------------
+# Objetivos:
+# - Registrar el estado y los artefactos de cada etapa de un archivo en <base>_manifiesto.json.
+# - Al volver a correr, saltar las etapas completas y seguir desde la primera incompleta.
+# - Guardar el resultado de cada ventana del análisis: un corte no obliga a repetir las ya hechas.
+# - Anotar los archivos subidos a Gemini para borrar los que quedaron huérfanos tras una caída.
+
+import os
+import glob
+import json
+import tempfile
+import threading
+from datetime import datetime
+
+ETAPAS = ("transcripcion", "dossier", "subida", "analisis", "plan", "resolve", "exportar")
+
+PENDIENTE = "pendiente"
+COMPLETADO = "completado"
+PARCIAL = "parcial"
+ERROR = "error"
+# Estados propios de la etapa "subida"
+SUBIDO = "subido"
+BORRADO = "borrado"
+
+
+def ruta_manifiesto(directorio: str, base_name: str) -> str:
+    return os.path.join(directorio, f"{base_name}_manifiesto.json")
+
+
+def _clave_ventana(inicio: float, fin: float) -> str:
+    return f"{inicio:g}-{fin:g}"
+
+
+class Manifiesto:
+    """Estado de las etapas de un archivo, persistido en disco tras cada cambio.
+
+    Cada etapa guarda su estado, la ruta de su artefacto y la clave de caché de
+    los parámetros con que se generó: si los parámetros cambian, la etapa deja
+    de contar como completa. Se puede usar desde varios hilos a la vez.
+    """
+
+    def __init__(self, ruta: str, datos: dict):
+        self.ruta = ruta
+        self.datos = datos
+        self._lock = threading.Lock()
+
+    @classmethod
+    def cargar(cls, directorio: str, source_path: str, huella: str) -> "Manifiesto":
+        """Abre el manifiesto del archivo; si el archivo de entrada cambió, empieza de cero."""
+        base_name = os.path.splitext(os.path.basename(source_path))[0]
+        ruta = ruta_manifiesto(directorio, base_name)
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            datos = None
+
+        if datos is None or datos.get("huella") != huella:
+            if datos is not None:
+                print(f"--- [Manifiesto] {os.path.basename(source_path)} cambió: se descarta el progreso anterior. ---")
+            # Las subidas pendientes de borrar se conservan para la recolección
+            subida = (datos or {}).get("etapas", {}).get("subida")
+            datos = {"source_path": source_path, "huella": huella, "etapas": {}, "ventanas": {}}
+            if subida and subida.get("estado") == SUBIDO:
+                datos["etapas"]["subida"] = subida
+        return cls(ruta, datos)
+
+    def _guardar(self) -> None:
+        # Escritura atómica, como en la caché: nunca queda un manifiesto a medio escribir
+        directorio = os.path.dirname(self.ruta)
+        os.makedirs(directorio, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.datos, f, ensure_ascii=False, indent=4)
+        os.replace(tmp, self.ruta)
+
+    # --- Etapas ---
+
+    def etapa(self, nombre: str) -> dict:
+        with self._lock:
+            return dict(self.datos["etapas"].get(nombre, {"estado": PENDIENTE}))
+
+    def completada(self, nombre: str, clave: str | None = None) -> bool:
+        """True si la etapa terminó con la misma clave y su artefacto sigue en disco."""
+        etapa = self.etapa(nombre)
+        if etapa["estado"] != COMPLETADO:
+            return False
+        if clave is not None and etapa.get("clave") != clave:
+            return False
+        artefacto = etapa.get("artefacto")
+        return artefacto is None or os.path.exists(artefacto)
+
+    def marcar(self, nombre: str, estado: str, **datos) -> None:
+        with self._lock:
+            self.datos["etapas"][nombre] = {
+                "estado": estado, "actualizado": datetime.now().isoformat(timespec="seconds"), **datos
+            }
+            self._guardar()
+
+    def invalidar_desde(self, nombre: str) -> None:
+        """Marca como pendientes las etapas posteriores a `nombre` (sus entradas cambiaron)."""
+        posteriores = ETAPAS[ETAPAS.index(nombre) + 1:]
+        with self._lock:
+            for etapa in posteriores:
+                # La subida no se olvida: si sigue en el servidor hay que poder borrarla
+                if etapa != "subida":
+                    self.datos["etapas"].pop(etapa, None)
+            self._guardar()
+
+    def primera_incompleta(self) -> str | None:
+        for nombre in ETAPAS:
+            if nombre == "subida":
+                continue
+            if self.etapa(nombre)["estado"] != COMPLETADO:
+                return nombre
+        return None
+
+    # --- Ventanas del análisis ---
+
+    def ventanas(self, clave: str) -> dict:
+        """Resultados por ventana ya guardados para esta clave de análisis."""
+        with self._lock:
+            guardadas = self.datos.get("ventanas", {})
+            if guardadas.get("clave") != clave:
+                return {}
+            return dict(guardadas.get("resultados", {}))
+
+    def guardar_ventana(self, clave: str, inicio: float, fin: float, bloques: list[dict]) -> None:
+        with self._lock:
+            guardadas = self.datos.setdefault("ventanas", {})
+            if guardadas.get("clave") != clave:
+                guardadas.clear()
+                guardadas.update({"clave": clave, "resultados": {}})
+            guardadas["resultados"][_clave_ventana(inicio, fin)] = bloques
+            self._guardar()
+
+
+def recolectar_subidas(directorio: str, genai) -> int:
+    """Borra de Gemini los archivos que quedaron subidos tras una corrida interrumpida.
+
+    Recorre los manifiestos de `directorio` y borra cada subida que no figure como
+    borrada. Devuelve cuántas se borraron.
+    """
+    borradas = 0
+    for ruta in glob.glob(os.path.join(directorio, "*_manifiesto.json")):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        subida = datos.get("etapas", {}).get("subida", {})
+        if subida.get("estado") != SUBIDO:
+            continue
+
+        manifiesto = Manifiesto(ruta, datos)
+        print(f"--- [Manifiesto] Borrando subida huérfana {subida['archivo_id']} ({os.path.basename(datos['source_path'])}) ---")
+        try:
+            genai.delete_file(subida["archivo_id"])
+        except Exception as e:
+            # Los archivos de Gemini expiran solos a las 48 h: si ya no existe, no hay nada que borrar
+            print(f"Advertencia: no se pudo borrar {subida['archivo_id']}: {e}")
+        manifiesto.marcar("subida", BORRADO, archivo_id=subida["archivo_id"])
+        borradas += 1
+    return borradas
@@ -0,0 +1,277 @@
+# agents/metricas.py = Instrumentación del pipeline: tiempos, recursos y contadores
+
+#--------------------------------------
+# Objetivos:
+# - Medir cada etapa con spans anidados (extracción de audio, carga del modelo, subida, espera, etc.).
+# - Muestrear RSS y CPU del proceso durante la corrida.
+# - Contar llamadas puntuales: sondeos a Gemini, llamadas a la API de Resolve, aciertos de caché.
+# - Exportar JSON por corrida, traza de Chrome (chrome://tracing, Perfetto) y OTLP-JSON (OpenTelemetry).
+
+import os
+import sys
+import json
+import time
+import asyncio
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+INTERVALO_MUESTREO_S = 0.5
+
+# Span activo del contexto actual (hilo o tarea asyncio): padre de los spans que se abran dentro
+_span_actual = contextvars.ContextVar("span_actual", default=None)
+
+
+# --- MEMORIA Y CPU DEL PROCESO ---
+
+def rss_actual_mb() -> float | None:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        # Linux sin psutil: la segunda columna de statm son las páginas residentes
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def rss_pico_mb() -> float | None:
+    """Pico de memoria residente del proceso desde que arrancó."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: no hay resource, se usa psutil si está
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo informa en KiB, macOS en bytes
+    return pico / 2**20 if sys.platform == "darwin" else pico / 1024
+
+
+def _pista() -> int:
+    # Las tareas asyncio de un mismo hilo se solapan: cada una va en su propia pista de la traza
+    try:
+        tarea = asyncio.current_task()
+    except RuntimeError:
+        tarea = None
+    return id(tarea) if tarea is not None else threading.get_ident()
+
+
+class Metricas:
+    """Registro de spans, contadores y muestras de recursos de una corrida.
+
+    Es seguro usarlo desde varios hilos y tareas asyncio a la vez. Los tiempos se
+    guardan en nanosegundos de perf_counter relativos al inicio de la corrida.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._muestreador = None
+        self.reiniciar()
+
+    def reiniciar(self, nombre: str = "xponencia"):
+        with self._lock:
+            self.nombre = nombre
+            self.trace_id = secrets.token_hex(16)
+            self.inicio_unix_ns = time.time_ns()
+            self.inicio_ns = time.perf_counter_ns()
+            self.spans = []
+            self.contadores = {}
+            self.muestras = []
+            self.pistas = {}
+
+    # --- Spans ---
+
+    @contextmanager
+    def span(self, nombre: str, **atributos):
+        """Mide el bloque. Los atributos se pueden completar dentro: `with span(...) as s: s["x"] = 1`."""
+        padre = _span_actual.get()
+        span_id = secrets.token_hex(8)
+        token = _span_actual.set(span_id)
+        pista = _pista()
+        hilo = threading.current_thread().name
+        inicio = time.perf_counter_ns()
+        error = None
+        try:
+            yield atributos
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            fin = time.perf_counter_ns()
+            _span_actual.reset(token)
+            registro = {
+                "nombre": nombre, "id": span_id, "padre": padre, "pista": pista,
+                "inicio_ns": inicio - self.inicio_ns, "dur_ns": fin - inicio, "atributos": atributos,
+            }
+            if error:
+                registro["error"] = error
+            with self._lock:
+                self.spans.append(registro)
+                self.pistas.setdefault(pista, hilo)
+
+    def contar(self, nombre: str, n: int = 1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    # --- Muestreo de recursos ---
+
+    def iniciar_muestreo(self, intervalo_s: float = INTERVALO_MUESTREO_S):
+        if self._muestreador is not None:
+            return
+        self._detener.clear()
+        self._muestreador = threading.Thread(target=self._muestrear, args=(intervalo_s,),
+                                             name="metricas-muestreo", daemon=True)
+        self._muestreador.start()
+
+    def detener_muestreo(self):
+        if self._muestreador is None:
+            return
+        self._detener.set()
+        self._muestreador.join()
+        self._muestreador = None
+
+    def _muestrear(self, intervalo_s: float):
+        cpu_prev, pared_prev = time.process_time(), time.perf_counter()
+        while True:
+            # Al detener se toma una última muestra: una corrida más corta que el intervalo también la tiene
+            detenido = self._detener.wait(intervalo_s)
+            cpu, pared = time.process_time(), time.perf_counter()
+            # CPU en % de un núcleo: 250 = dos núcleos y medio ocupados
+            muestra = {
+                "t_ns": time.perf_counter_ns() - self.inicio_ns,
+                "rss_mb": rss_actual_mb(),
+                "cpu_pct": round(100 * (cpu - cpu_prev) / max(pared - pared_prev, 1e-9), 1),
+            }
+            cpu_prev, pared_prev = cpu, pared
+            with self._lock:
+                self.muestras.append(muestra)
+            if detenido:
+                return
+
+    # --- Resúmenes y exportación ---
+
+    def resumen(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+            muestras = list(self.muestras)
+            contadores = dict(self.contadores)
+
+        por_nombre = {}
+        for span in spans:
+            etapa = por_nombre.setdefault(span["nombre"], {"llamadas": 0, "total_s": 0.0, "max_s": 0.0, "errores": 0})
+            dur_s = span["dur_ns"] / 1e9
+            etapa["llamadas"] += 1
+            etapa["total_s"] += dur_s
+            etapa["max_s"] = max(etapa["max_s"], dur_s)
+            etapa["errores"] += "error" in span
+        for etapa in por_nombre.values():
+            etapa["total_s"] = round(etapa["total_s"], 4)
+            etapa["max_s"] = round(etapa["max_s"], 4)
+
+        rss = [m["rss_mb"] for m in muestras if m["rss_mb"] is not None]
+        pico = rss_pico_mb()
+        cpu = [m["cpu_pct"] for m in muestras]
+        return {
+            "corrida": self.nombre,
+            "trace_id": self.trace_id,
+            "inicio": datetime.fromtimestamp(self.inicio_unix_ns / 1e9).isoformat(timespec="seconds"),
+            "duracion_s": round((time.perf_counter_ns() - self.inicio_ns) / 1e9, 3),
+            "etapas": dict(sorted(por_nombre.items(), key=lambda kv: -kv[1]["total_s"])),
+            "contadores": contadores,
+            "recursos": {
+                "rss_pico_mb": round(pico, 1) if pico is not None else None,
+                "rss_max_muestreado_mb": round(max(rss), 1) if rss else None,
+                "cpu_promedio_pct": round(sum(cpu) / len(cpu), 1) if cpu else None,
+                "cpu_max_pct": max(cpu) if cpu else None,
+                "muestras": len(muestras),
+            },
+        }
+
+    def traza_chrome(self) -> dict:
+        """Formato Trace Event de Chrome: eventos "X" para spans y "C" para las muestras."""
+        pid = os.getpid()
+        with self._lock:
+            spans, muestras, pistas = list(self.spans), list(self.muestras), dict(self.pistas)
+        eventos = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.nombre}},
+            *({"name": "thread_name", "ph": "M", "pid": pid, "tid": pista, "args": {"name": hilo}}
+              for pista, hilo in pistas.items()),
+        ]
+        for span in spans:
+            eventos.append({
+                "name": span["nombre"], "ph": "X", "pid": pid, "tid": span["pista"],
+                "ts": span["inicio_ns"] / 1000, "dur": span["dur_ns"] / 1000,
+                "args": {**span["atributos"], **({"error": span["error"]} if "error" in span else {})},
+            })
+        for muestra in muestras:
+            valores = {k: v for k, v in (("rss_mb", muestra["rss_mb"]), ("cpu_pct", muestra["cpu_pct"])) if v is not None}
+            eventos.append({"name": "recursos", "ph": "C", "pid": pid, "ts": muestra["t_ns"] / 1000, "args": valores})
+        return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+
+    def traza_otlp(self) -> dict:
+        """Spans en el JSON de OTLP/HTTP (ExportTraceServiceRequest), listos para un collector."""
+        def valor(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        with self._lock:
+            spans = list(self.spans)
+        otlp_spans = []
+        for span in spans:
+            inicio = self.inicio_unix_ns + span["inicio_ns"]
+            otlp = {
+                "traceId": self.trace_id, "spanId": span["id"], "name": span["nombre"], "kind": 1,
+                "startTimeUnixNano": str(inicio), "endTimeUnixNano": str(inicio + span["dur_ns"]),
+                "attributes": [{"key": k, "value": valor(v)} for k, v in span["atributos"].items()],
+                # STATUS_CODE_ERROR = 2
+                "status": {"code": 2, "message": span["error"]} if "error" in span else {},
+            }
+            if span["padre"]:
+                otlp["parentSpanId"] = span["padre"]
+            otlp_spans.append(otlp)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.nombre}}]},
+            "scopeSpans": [{"scope": {"name": "agents.metricas"}, "spans": otlp_spans}],
+        }]}
+
+    def exportar(self, directorio: str, prefijo: str = "metricas") -> dict:
+        """Escribe <prefijo>_<fecha>.json, .trace.json (Chrome) y .otlp.json. Devuelve las rutas."""
+        os.makedirs(directorio, exist_ok=True)
+        base = os.path.join(directorio, f"{prefijo}_{datetime.now():%Y%m%d_%H%M%S}")
+        rutas = {"resumen": f"{base}.json", "chrome": f"{base}.trace.json", "otlp": f"{base}.otlp.json"}
+        resumen = self.resumen()
+        with self._lock:
+            resumen["spans"] = list(self.spans)
+            resumen["muestras"] = list(self.muestras)
+        for clave, datos in (("resumen", resumen), ("chrome", self.traza_chrome()), ("otlp", self.traza_otlp())):
+            with open(rutas[clave], "w", encoding="utf-8") as f:
+                json.dump(datos, f, ensure_ascii=False)
+        print(f"--- [Métricas] Métricas de la corrida guardadas en: {rutas['resumen']} ---")
+        return rutas
+
+
+# Registro global del proceso: los agentes lo usan a través de span() y contar()
+METRICAS = Metricas()
+
+
+def span(nombre: str, **atributos):
+    return METRICAS.span(nombre, **atributos)
+
+
+def contar(nombre: str, n: int = 1):
+    METRICAS.contar(nombre, n)
@@ -0,0 +1,138 @@
+# agents/proxy.py = Generación de proxies livianos para subir a Gemini
+
+#--------------------------------------
+# Objetivos:
+# - Convertir el máster (ProRes, MP4 de alto bitrate, etc.) en un proxy chico.
+# - Audio-only cuando la entrada es audio.
+# - Reutilizar el proxy si el máster no cambió.
+# - Proxy condensado: solo los tramos con voz del mapa de voz, sin los silencios largos.
+
+import os
+import json
+import subprocess
+
+from config import AUDIO_EXTS
+from agents.cache import hash_texto
+from agents.metricas import span, contar
+
+# Gemini muestrea el video a 1 fps; 2 fps y 360p alcanzan para el análisis no verbal
+PROXY_HEIGHT = 360
+PROXY_FPS = 2
+PROXY_CRF = 32
+PROXY_AUDIO_BITRATE = "48k"
+PROXY_AUDIO_RATE = 16000
+
+# Cambiar esta versión invalida los proxies ya generados
+PROXY_VERSION = 1
+
+
+def _proxy_params(es_audio: bool, tramos: list[tuple[float, float]] | None = None) -> dict:
+    if es_audio:
+        params = {"version": PROXY_VERSION, "audio": PROXY_AUDIO_BITRATE, "rate": PROXY_AUDIO_RATE}
+    else:
+        params = {
+            "version": PROXY_VERSION, "height": PROXY_HEIGHT, "fps": PROXY_FPS, "crf": PROXY_CRF,
+            "audio": PROXY_AUDIO_BITRATE, "rate": PROXY_AUDIO_RATE,
+        }
+    if tramos is not None:
+        params["tramos"] = hash_texto(json.dumps(tramos))
+    return params
+
+
+def _seleccion(tramos: list[tuple[float, float]]) -> str:
+    # Expresión de select/aselect que deja pasar solo los tramos pedidos. Es un árbol de
+    # if() sobre los inicios: cada trama evalúa log2(N) comparaciones y no los N tramos
+    if len(tramos) == 1:
+        inicio, fin = tramos[0]
+        return f"between(t,{inicio:.3f},{fin:.3f})"
+    medio = len(tramos) // 2
+    return f"if(lt(t,{tramos[medio][0]:.3f}),{_seleccion(tramos[:medio])},{_seleccion(tramos[medio:])})"
+
+
+def _filtros_condensado(tramos: list[tuple[float, float]], es_audio: bool) -> str:
+    """Filtergraph del proxy condensado: se descartan los silencios y se renumeran los tiempos."""
+    seleccion = _seleccion(tramos)
+    filtros = [f"[0:a]aselect='{seleccion}',asetpts=N/SR/TB[a]"]
+    if not es_audio:
+        filtros.append(f"[0:v]select='{seleccion}',setpts=N/FRAME_RATE/TB,"
+                       f"scale=-2:{PROXY_HEIGHT},fps={PROXY_FPS}[v]")
+    return ";\n".join(filtros)
+
+
+def _ffmpeg_cmd(source_path: str, proxy_path: str, es_audio: bool, guion_filtros: str | None = None) -> list[str]:
+    audio = ["-c:a", "aac", "-b:a", PROXY_AUDIO_BITRATE, "-ac", "1", "-ar", str(PROXY_AUDIO_RATE)]
+    if guion_filtros is not None:
+        # El filtergraph del proxy condensado crece con la cantidad de pausas: va en un archivo
+        # para no pasar el límite de largo de la línea de comandos (32 KB en Windows)
+        filtros = ["-filter_complex_script", guion_filtros] + ([] if es_audio else ["-map", "[v]"]) + ["-map", "[a]"]
+    else:
+        filtros = [] if es_audio else ["-vf", f"scale=-2:{PROXY_HEIGHT},fps={PROXY_FPS}"]
+    if es_audio:
+        return ["ffmpeg", "-nostdin", "-y", "-v", "error", "-i", source_path, "-vn", *filtros, *audio, proxy_path]
+    return [
+        "ffmpeg", "-nostdin", "-y", "-v", "error", "-i", source_path,
+        # -2 mantiene la relación de aspecto con un ancho par (requisito de H.264)
+        *filtros,
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", str(PROXY_CRF), "-pix_fmt", "yuv420p",
+        *audio,
+        "-movflags", "+faststart",
+        proxy_path,
+    ]
+
+
+def build_proxy(source_path: str, output_dir: str, huella: str | None = None,
+                tramos: list[tuple[float, float]] | None = None) -> str:
+    """Genera (o reutiliza) el proxy de `source_path` en `output_dir` y devuelve su ruta.
+
+    Junto al proxy se guarda un .json con la huella del máster y los parámetros;
+    si coinciden, el proxy existente se reutiliza sin volver a codificar.
+    Con `tramos` (los del mapa de voz) el proxy es condensado: solo contiene esos
+    tramos, uno detrás de otro, y sus tiempos son los del audio condensado.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base_name, ext = os.path.splitext(os.path.basename(source_path))
+    es_audio = ext.lower() in AUDIO_EXTS
+    sufijo = "_proxy_voz" if tramos is not None else "_proxy"
+    proxy_path = os.path.join(output_dir, f"{base_name}{sufijo}{'.m4a' if es_audio else '.mp4'}")
+    meta_path = f"{proxy_path}.json"
+
+    if huella is None:
+        st = os.stat(source_path)
+        huella = f"{st.st_size}:{st.st_mtime_ns}"
+    meta = {"huella": huella, "params": _proxy_params(es_audio, tramos)}
+
+    if os.path.exists(proxy_path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            if json.load(f) == meta:
+                print(f"--- [Proxy] Reutilizando proxy existente: {proxy_path} ---")
+                contar("proxy.reutilizados")
+                return proxy_path
+
+    print(f"--- [Proxy] Generando proxy {'de audio' if es_audio else 'de video'}{' condensado' if tramos is not None else ''} "
+          f"para {os.path.basename(source_path)}... ---")
+    # Se escribe a un temporal para no dejar un proxy a medias si FFmpeg falla
+    tmp_path = f"{proxy_path}.tmp{os.path.splitext(proxy_path)[1]}"
+    guion_filtros = None
+    if tramos is not None:
+        guion_filtros = f"{proxy_path}.filtros.txt"
+        with open(guion_filtros, "w", encoding="utf-8") as f:
+            f.write(_filtros_condensado(tramos, es_audio))
+    try:
+        with span("proxy", archivo=os.path.basename(source_path), audio=es_audio):
+            proc = subprocess.run(_ffmpeg_cmd(source_path, tmp_path, es_audio, guion_filtros), capture_output=True)
+    finally:
+        if guion_filtros is not None and os.path.exists(guion_filtros):
+            os.remove(guion_filtros)
+    if proc.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"FFmpeg no pudo generar el proxy: {proc.stderr.decode(errors='ignore')[-500:]}")
+    os.replace(tmp_path, proxy_path)
+
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    original_mb = os.path.getsize(source_path) / 1024 ** 2
+    proxy_mb = os.path.getsize(proxy_path) / 1024 ** 2
+    print(f"--- [Proxy] Listo: {original_mb:.1f} MB -> {proxy_mb:.1f} MB ---")
+    return proxy_path
@@ -1,34 +1,29 @@
 # agents/strategist.py
-import os
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
+import time
+import random
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# --- CONFIGURACIÓN ---
-# Cargar variables de entorno
-load_dotenv()
+from config import configurar_gemini
+from agents.metricas import span, contar
 
-# API de Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("No se encontró la API Key de Gemini")
-genai.configure(api_key=GEMINI_API_KEY)
+# --- CONFIGURACIÓN ---
+# La API key se lee y el SDK se configura con la primera llamada (config.configurar_gemini)
 
 # Definimos el modelo
 MODEL_NAME = "gemini-2.5-pro"
 
-# --- LA PLANTILLA DEL PROMPT ---
-
-PROMPT_TEMPLATE_VANTA = """ Quiero que analices el siguiente material compuesto por un video y su transcripción textual.
+# --- MODO POR VENTANAS ---
+# Múltiplo de 10 s: los bloques de 5 a 10 s del prompt nunca cruzan dos ventanas
+WINDOW_S = 120
+WINDOW_WORKERS = 4
+WINDOW_RETRIES = 3
 
-Instrucciones:
-
-Divide el video en bloques de 5 a 10 segundos.
-
-Para cada bloque, indica el rango de tiempo con marcas [inicio - fin].
+# --- LA PLANTILLA DEL PROMPT ---
 
-En cada bloque escribe un único apartado:
-Analisis: debe ser un análisis integral que combine los tres niveles:
+# Descripción de los tres niveles del análisis, compartida por todas las plantillas
+_NIVELES_ANALISIS = """Analisis: debe ser un análisis integral que combine los tres niveles:
 
 Verbal: interpreta el contenido de lo dicho, tono discursivo, elección de palabras, pausas, silencios y la intención comunicativa aparente. Considera si hay congruencia o incongruencia entre lo que se dice y cómo se dice.
 
@@ -37,7 +32,18 @@ No verbal: describe expresiones faciales, microexpresiones, contacto visual, len
 Estratégico: analiza la interacción desde la psicología evolutiva y social. Observa señales de poder, dominancia o sumisión, empatía, cooperación, manipulación, atracción, rechazo, construcción de estatus, liderazgo, vulnerabilidad o intentos de persuasión. Interpreta cómo estas conductas afectan la dinámica grupal o individual.
 
 Cada bloque debe escribirse como un análisis narrativo y contextualizado, no como una lista.
+"""
+
+PROMPT_TEMPLATE_VANTA = """ Quiero que analices el siguiente material compuesto por un video y su transcripción textual.
+
+Instrucciones:
 
+Divide el video en bloques de 5 a 10 segundos.
+
+Para cada bloque, indica el rango de tiempo con marcas [inicio - fin].
+
+En cada bloque escribe un único apartado:
+""" + _NIVELES_ANALISIS + """
 Al terminar todos los bloques, haz un Meta-análisis final, resumiendo la evolución de las dinámicas sociales, los roles de los participantes y patrones clave.
 
 # DATOS (GUION DEL VIDEO)
@@ -59,7 +65,120 @@ Meta-analisis final:
 
 """
 
-def get_edit_plan_from_gemini(dossier_data: dict, uploaded_video_file) -> dict:
+# --- PLANTILLAS DEL MODO POR VENTANAS ---
+
+PROMPT_TEMPLATE_VENTANA = """ Quiero que analices un tramo de un video a partir de la imagen y su transcripción textual.
+
+Instrucciones:
+
+Analiza ÚNICAMENTE el tramo del video entre {inicio} y {fin}. El resto del video es solo contexto.
+
+Divide ese tramo en bloques de 5 a 10 segundos, sin salirte de sus límites.
+
+Para cada bloque, indica el rango de tiempo en segundos desde el inicio del video.
+
+En cada bloque escribe un único apartado:
+""" + _NIVELES_ANALISIS + """
+# DATOS (GUION DEL TRAMO)
+Aquí tienes los diálogos de este tramo:
+
+{dossier_json}
+
+Formato de salida esperado (JSON):
+{{"segments": [{{"start": 0.0, "end": 7.0, "analisis": "..."}}, ...]}}
+
+"""
+
+PROMPT_TEMPLATE_META = """ A continuación tienes el análisis por bloques de un video completo, en orden cronológico.
+
+Haz un Meta-análisis final, resumiendo la evolución de las dinámicas sociales, los roles de los participantes y patrones clave.
+
+# ANÁLISIS POR BLOQUES
+
+{bloques_json}
+
+Formato de salida esperado (JSON):
+{{"meta_analisis_final": "..."}}
+
+"""
+
+# --- LECTURA INCREMENTAL DE LA RESPUESTA ---
+
+class BlockStreamParser:
+    """Extrae los bloques de la respuesta JSON a medida que llega por streaming.
+
+    Un bloque es cada objeto que es elemento directo del primer arreglo de
+    objetos de la respuesta (por ejemplo "segments": [{...}, {...}]). Se
+    devuelve en cuanto se cierra su llave, sin esperar al resto del JSON.
+    """
+
+    def __init__(self):
+        self._pila = []          # contenedores abiertos: "{" o "["
+        self._en_string = False
+        self._escape = False
+        self._inicio_bloque = None
+        self._arreglo_bloques = None   # profundidad del arreglo que contiene los bloques
+        self._buffer = ""
+
+    def feed(self, texto: str) -> list[dict]:
+        bloques = []
+        base = len(self._buffer)
+        self._buffer += texto
+        for i in range(base, len(self._buffer)):
+            c = self._buffer[i]
+            if self._en_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._en_string = False
+                continue
+
+            if c == '"':
+                self._en_string = True
+            elif c in "{[":
+                if c == "{" and self._pila and self._pila[-1] == "[":
+                    # El primer objeto dentro de un arreglo fija dónde están los bloques
+                    if self._arreglo_bloques is None:
+                        self._arreglo_bloques = len(self._pila)
+                    if len(self._pila) == self._arreglo_bloques:
+                        self._inicio_bloque = i
+                self._pila.append(c)
+            elif c in "}]":
+                if c == "}" and self._inicio_bloque is not None and len(self._pila) == self._arreglo_bloques + 1:
+                    try:
+                        bloques.append(json.loads(self._buffer[self._inicio_bloque:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._inicio_bloque = None
+                if self._pila:
+                    self._pila.pop()
+
+        # Solo se conserva en memoria lo que puede formar parte de un bloque abierto
+        if self._inicio_bloque is None:
+            self._buffer = ""
+        elif self._inicio_bloque > 0:
+            self._buffer = self._buffer[self._inicio_bloque:]
+            self._inicio_bloque = 0
+        return bloques
+
+
+class ErrorAnalisis(Exception):
+    """El análisis de Gemini falló. `bloques` tiene lo que llegó completo antes del error."""
+
+    def __init__(self, mensaje: str, bloques: list[dict] | None = None):
+        super().__init__(mensaje)
+        self.bloques = bloques or []
+
+
+def get_edit_plan_from_gemini(dossier_data: dict, uploaded_video_file, on_block=None) -> dict:
+    """Pide el plan completo a Gemini.
+
+    Si se pasa `on_block`, la respuesta se pide en streaming y se llama a
+    `on_block(bloque)` por cada bloque apenas se completa.
+    Un error se propaga como ErrorAnalisis (nunca se devuelve un plan vacío).
+    """
 
     print("--- [Estratega] Iniciando análisis holístico del video completo ---")
 
@@ -70,22 +189,179 @@ def get_edit_plan_from_gemini(dossier_data: dict, uploaded_video_file) -> dict:
     full_prompt = PROMPT_TEMPLATE_VANTA.format(dossier_json=dossier_json_string)
 
     # 3. Llamar a la API de Gemini con el prompt de texto y el archivo de video
+    bloques = []
     try:
+        genai = configurar_gemini()
         model = genai.GenerativeModel(MODEL_NAME)
+        contar("gemini.generaciones")
         # Enviamos una lista que contiene tanto el texto como el video
         response = model.generate_content(
             [full_prompt, uploaded_video_file],
             generation_config=genai.types.GenerationConfig(
                 response_mime_type="application/json"
-            )
+            ),
+            stream=on_block is not None
         )
-        
+
+        if on_block is not None:
+            parser = BlockStreamParser()
+            partes = []
+            for chunk in response:
+                partes.append(chunk.text)
+                for bloque in parser.feed(chunk.text):
+                    bloques.append(bloque)
+                    on_block(bloque)
+            response_text = "".join(partes)
+        else:
+            response_text = response.text
+
         # 4. Cargar la respuesta de texto JSON en un diccionario de Python
-        plan_json = json.loads(response.text)
+        plan_json = json.loads(response_text)
         print("--- [Estratega] Plan de corte recibido exitosamente de Gemini. ---")
         return plan_json
 
     except Exception as e:
         print(f"¡ERROR! Ocurrió un error en el análisis holístico: {e}")
-        # En caso de error, devolvemos un plan vacío
-        return {"plan_de_corte": []}
\ No newline at end of file
+        if bloques:
+            # El stream se cortó: los bloques que ya llegaron completos viajan con el error
+            print(f"--- [Estratega] Se recuperaron {len(bloques)} bloques recibidos antes del error. ---")
+        raise ErrorAnalisis(f"Falló el análisis holístico: {e}", bloques) from e
+
+
+# --- ANÁLISIS POR VENTANAS (map-reduce) ---
+
+def _format_mmss(segundos: float) -> str:
+    minutos, seg = divmod(int(segundos), 60)
+    return f"{minutos:02}:{seg:02}"
+
+
+def split_windows(duration: float, window_s: float = WINDOW_S) -> list[tuple[float, float]]:
+    """Divide [0, duration] en ventanas consecutivas de `window_s` segundos."""
+    ventanas = []
+    inicio = 0.0
+    while inicio < duration:
+        ventanas.append((inicio, min(inicio + window_s, duration)))
+        inicio += window_s
+    return ventanas
+
+
+def _dialogues_in_window(dossier_data: dict, inicio: float, fin: float) -> list[dict]:
+    return [
+        d for d in dossier_data.get("dialogues", [])
+        if d.get("end", 0) > inicio and d.get("start", 0) < fin
+    ]
+
+
+def _generate_json(parts: list, llamada=None) -> dict:
+    # `llamada()` es un context manager que envuelve cada pedido a la API (rate limit y
+    # concurrencia del cliente asíncrono); sin él, el pedido sale directo
+    genai = configurar_gemini()
+    model = genai.GenerativeModel(MODEL_NAME)
+    contar("gemini.generaciones")
+    with llamada() if llamada is not None else nullcontext(), span("gemini.generar_json"):
+        response = model.generate_content(
+            parts,
+            generation_config=genai.types.GenerationConfig(
+                response_mime_type="application/json"
+            )
+        )
+    return json.loads(response.text)
+
+
+def _analyze_window(dossier_data: dict, uploaded_video_file, inicio: float, fin: float,
+                    retries: int = WINDOW_RETRIES, llamada=None) -> list[dict]:
+    dossier_ventana = {
+        "input_name": dossier_data.get("input_name"),
+        "window": [inicio, fin],
+        "dialogues": _dialogues_in_window(dossier_data, inicio, fin),
+    }
+    prompt = PROMPT_TEMPLATE_VENTANA.format(
+        inicio=_format_mmss(inicio), fin=_format_mmss(fin),
+        dossier_json=json.dumps(dossier_ventana, indent=2, ensure_ascii=False)
+    )
+
+    # Cada ventana se reintenta por separado: un fallo no tira el análisis completo
+    for intento in range(retries):
+        try:
+            resultado = _generate_json([prompt, uploaded_video_file], llamada)
+            return [
+                seg for seg in resultado.get("segments", [])
+                if inicio <= float(seg.get("start", -1)) < fin
+            ]
+        except Exception as e:
+            contar("gemini.fallos_ventana")
+            print(f"Advertencia: ventana [{_format_mmss(inicio)} - {_format_mmss(fin)}] falló (intento {intento + 1}/{retries}): {e}")
+            if intento + 1 < retries:
+                time.sleep(random.uniform(1, 2) * 2 ** intento)
+    raise RuntimeError(f"La ventana [{_format_mmss(inicio)} - {_format_mmss(fin)}] falló tras {retries} intentos")
+
+
+def get_edit_plan_windowed(dossier_data: dict, uploaded_video_file, on_block=None,
+                           window_s: float = WINDOW_S, workers: int = WINDOW_WORKERS,
+                           ventanas_previas: dict | None = None, on_window=None, llamada=None) -> dict:
+    """Analiza el video por ventanas en paralelo y cierra con una llamada de meta-análisis.
+
+    Cada ventana recibe solo sus diálogos; si se pasa `on_block`, se llama con
+    cada bloque en cuanto termina su ventana. El resultado tiene la forma
+    {"segments": [...], "meta_analisis_final": "...", "ventanas_fallidas": [...]}.
+    `ventanas_previas` ({"inicio-fin": bloques}) son ventanas ya analizadas en una
+    corrida anterior y no se vuelven a pedir; `on_window(inicio, fin, bloques)` se
+    llama al terminar cada ventana nueva, para poder guardarla.
+    `llamada`, si se pasa, envuelve cada pedido a Gemini (ventanas, reintentos y meta).
+    Si ninguna ventana se pudo analizar, lanza ErrorAnalisis.
+    """
+    dialogues = dossier_data.get("dialogues", [])
+    duration = dossier_data.get("duration") or max((d.get("end", 0) for d in dialogues), default=0)
+    ventanas = split_windows(duration, window_s)
+    print(f"--- [Estratega] Análisis por ventanas: {len(ventanas)} ventanas de {window_s:.0f} s ---")
+
+    # Map: una llamada por ventana, en paralelo
+    segments, fallidas, pendientes = [], [], []
+    ventanas_previas = ventanas_previas or {}
+    for inicio, fin in ventanas:
+        previas = ventanas_previas.get(f"{inicio:g}-{fin:g}")
+        if previas is None:
+            pendientes.append((inicio, fin))
+            continue
+        segments.extend(previas)
+        if on_block is not None:
+            for bloque in previas:
+                on_block(bloque)
+    if len(pendientes) < len(ventanas):
+        print(f"--- [Estratega] {len(ventanas) - len(pendientes)} ventanas recuperadas de una corrida anterior ---")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="estratega") as pool:
+        futures = {
+            pool.submit(_analyze_window, dossier_data, uploaded_video_file, inicio, fin, llamada=llamada): (inicio, fin)
+            for inicio, fin in pendientes
+        }
+        for future in as_completed(futures):
+            try:
+                bloques_ventana = future.result()
+            except Exception as e:
+                print(f"¡ERROR! {e}")
+                fallidas.append(list(futures[future]))
+                continue
+            segments.extend(bloques_ventana)
+            if on_window is not None:
+                on_window(*futures[future], bloques_ventana)
+            if on_block is not None:
+                for bloque in bloques_ventana:
+                    on_block(bloque)
+
+    fallidas.sort()
+    if not segments and fallidas:
+        print("¡ERROR! Ninguna ventana pudo analizarse.")
+        raise ErrorAnalisis("Ninguna ventana pudo analizarse.")
+    segments.sort(key=lambda seg: float(seg["start"]))
+
+    # Reduce: el meta-análisis final se hace sobre los bloques ya analizados
+    try:
+        prompt = PROMPT_TEMPLATE_META.format(bloques_json=json.dumps(segments, indent=2, ensure_ascii=False))
+        meta = _generate_json([prompt], llamada).get("meta_analisis_final", "")
+    except Exception as e:
+        print(f"¡ERROR! Falló el meta-análisis final: {e}")
+        meta = ""
+
+    print("--- [Estratega] Plan por ventanas completado. ---")
+    return {"segments": segments, "meta_analisis_final": meta, "ventanas_fallidas": fallidas}
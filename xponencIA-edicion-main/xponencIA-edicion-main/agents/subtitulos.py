@@ -1,32 +1,115 @@
 import re
 import os
-import json
-from datetime import timedelta
+import sys
+
+# Ejecutado como script (python agents/subtitulos.py): la raíz del proyecto no está en sys.path
+if __name__ == "__main__" and not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config_subtitulos
+from agents.timecode import PATRON_TIEMPO, ms_desde_partes, format_ms, dividir_intervalo
+from agents.indice_palabras import palabras_de_segmento
 
 # ==============================================================================
-# CONFIGURACIÓN GLOBAL DESDE ARCHIVO EXTERNO
+# CUES Y TIEMPOS EN MILISEGUNDOS
 # ==============================================================================
 
-CONFIG_PATH = "config.json"
-if os.path.exists(CONFIG_PATH):
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        CONFIG = json.load(f)
-else:
-    CONFIG = {
-        "subtitle_style": {"font": "Arial", "size": 50, "color": "white", "position": "bottom"},
-        "max_characters_per_line": 40
-    }
-    print("⚠️ No se encontró config.json, usando configuración por defecto.")
+class Cue:
+    """Un subtítulo. Los tiempos son enteros en milisegundos."""
+    __slots__ = ("indice", "inicio", "fin", "lineas")
+
+    def __init__(self, indice, inicio, fin, lineas):
+        self.indice = indice
+        self.inicio = inicio
+        self.fin = fin
+        self.lineas = lineas
+
+    @property
+    def texto(self):
+        return " ".join(self.lineas)
+
+    def __repr__(self):
+        return f"Cue({self.indice!r}, {format_ms(self.inicio)} --> {format_ms(self.fin)}, {self.lineas!r})"
+
+
+_LINEA_TIEMPO_RE = re.compile(rf"^\s*{PATRON_TIEMPO}\s*-->\s*{PATRON_TIEMPO}")
+CENSURA_RE = re.compile(r"(#{2,})")
 
 # ==============================================================================
-# LECTURA, PROCESAMIENTO Y ESCRITURA DE ARCHIVOS SRT
+# LECTURA Y ESCRITURA EN STREAMING (SRT / VTT)
 # ==============================================================================
 
+def iter_cues(ruta_archivo):
+    """Lee un SRT o VTT cue por cue, sin cargar el archivo entero en memoria.
+
+    Tolera BOM, finales de línea CRLF/CR, líneas en blanco repetidas o con
+    espacios, índices faltantes y bloques NOTE/STYLE de VTT.
+    """
+    # utf-8-sig descarta el BOM; newline=None normaliza CRLF y CR a \n
+    with open(ruta_archivo, "r", encoding="utf-8-sig", newline=None) as archivo:
+        actual = None
+        identificador = None
+        saltar_bloque = False
+        for linea in archivo:
+            linea = linea.rstrip("\n").rstrip()
+            if not linea:
+                if actual is not None:
+                    yield actual
+                    actual = None
+                identificador = None
+                saltar_bloque = False
+                continue
+            if saltar_bloque:
+                continue
+
+            match = _LINEA_TIEMPO_RE.match(linea)
+            if match:
+                if actual is not None:
+                    # Falta la línea en blanco entre cues: la última línea de texto era el índice
+                    if actual.lineas and actual.lineas[-1].strip().isdigit():
+                        identificador = actual.lineas.pop()
+                    yield actual
+                grupos = match.groups()
+                actual = Cue(identificador, ms_desde_partes(*grupos[:4]), ms_desde_partes(*grupos[4:]), [])
+                identificador = None
+            elif actual is not None:
+                actual.lineas.append(linea)
+            elif linea.startswith(("WEBVTT", "NOTE", "STYLE", "REGION")):
+                saltar_bloque = True
+            else:
+                identificador = linea.strip()
+        if actual is not None:
+            yield actual
+
+
+def escribir_cues(cues, ruta_salida, formato=None, cues_por_escritura=500):
+    """Escribe los cues en SRT o VTT (según la extensión), numerándolos de nuevo.
+
+    El texto se acumula y se escribe en bloques de `cues_por_escritura` cues.
+    Devuelve la cantidad de cues escritos.
+    """
+    formato = formato or ("vtt" if ruta_salida.lower().endswith(".vtt") else "srt")
+    separador = "." if formato == "vtt" else ","
+    total = 0
+    with open(ruta_salida, "w", encoding="utf-8", newline="\n") as f:
+        buffer = ["WEBVTT\n\n"] if formato == "vtt" else []
+        for total, cue in enumerate(cues, start=1):
+            buffer.append(
+                f"{total}\n{format_ms(cue.inicio, separador)} --> {format_ms(cue.fin, separador)}\n"
+            )
+            buffer.extend(f"{linea}\n" for linea in cue.lineas)
+            buffer.append("\n")
+            if total % cues_por_escritura == 0:
+                f.write("".join(buffer))
+                buffer.clear()
+        f.write("".join(buffer))
+    return total
+
+
 def leer_srt(ruta_archivo):
     print(f"🔄 Leyendo archivo SRT desde: {ruta_archivo}")
     try:
-        with open(ruta_archivo, "r", encoding="utf-8") as archivo:
-            contenido = archivo.read()
+        bloques = list(iter_cues(ruta_archivo))
     except FileNotFoundError:
         print(f"❌ Error: El archivo {ruta_archivo} no fue encontrado.")
         return None
@@ -34,115 +117,114 @@ def leer_srt(ruta_archivo):
         print(f"❌ Error al leer el archivo: {e}")
         return None
 
-    bloques_raw = contenido.strip().split("\n\n")
-    bloques = []
-
-    for bloque in bloques_raw:
-        lineas = bloque.split("\n")
-        if len(lineas) >= 3:
-            indice = lineas[0]
-            timestamp = lineas[1]
-            texto = lineas[2:]
-            bloques.append({'indice': indice, 'timestamp': timestamp, 'texto': texto})
-    
     print(f"✅ Se leyeron {len(bloques)} bloques de subtítulos.")
     return bloques
 
-def _parse_time(time_str):
-    parts = time_str.replace(',', '.').split(':')
-    h = int(parts[0])
-    m = int(parts[1])
-    s, ms = map(int, parts[2].split('.'))
-    return timedelta(hours=h, minutes=m, seconds=s, milliseconds=ms)
-
-def _format_time(td):
-    total_seconds = int(td.total_seconds())
-    milliseconds = td.microseconds // 1000
-    hours, remainder = divmod(total_seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
-
 # ==============================================================================
 # NUEVO: Contar caracteres por línea
 # ==============================================================================
-def contar_caracteres_por_linea(bloques):
-    max_chars = CONFIG["max_characters_per_line"]
+def contar_caracteres_por_linea(bloques, max_chars=None):
+    """Etapa de streaming: deja pasar los cues y avisa de las líneas demasiado largas."""
+    max_chars = max_chars or config_subtitulos()["max_characters_per_line"]
     print(f"📏 Máximo permitido: {max_chars} caracteres por línea")
+    excedidas = 0
     for bloque in bloques:
-        for linea in bloque['texto']:
+        for linea in bloque.lineas:
             length = len(linea)
             if length > max_chars:
-                print(f"⚠️ Bloque {bloque['indice']} excede ({length}/{max_chars}): {linea}")
-            else:
-                print(f"✅ Bloque {bloque['indice']} ({length}/{max_chars}): {linea}")
+                excedidas += 1
+                print(f"⚠️ Bloque {bloque.indice} excede ({length}/{max_chars}): {linea}")
+        yield bloque
+    print(f"📏 {excedidas} líneas exceden el máximo.")
 
 # ==============================================================================
 # División de subtítulos censurados
 # ==============================================================================
 def dividir_y_reajustar_subtitulos(bloques):
+    """Etapa de streaming: parte cada cue en los marcadores de censura (##)."""
     print(f"🔨 Buscando censuras para dividir los bloques.")
-    
-    nuevos_bloques = []
-    nuevo_indice = 1
-    
+
     for bloque in bloques:
-        texto_lineas = " ".join(bloque['texto'])
-        matches = list(re.finditer(r'(#{2,})', texto_lineas))
-        
-        if not matches:
-            bloque['indice'] = str(nuevo_indice)
-            nuevos_bloques.append(bloque)
-            nuevo_indice += 1
+        texto_lineas = bloque.texto
+        if "##" not in texto_lineas:
+            yield bloque
             continue
 
-        partes = []
-        ultima_pos = 0
-        for match in matches:
-            partes.append(texto_lineas[ultima_pos:match.start()].strip())
-            partes.append(match.group(0))
-            ultima_pos = match.end()
-        partes.append(texto_lineas[ultima_pos:].strip())
+        partes = [p.strip() for p in CENSURA_RE.split(texto_lineas)]
         partes = [p for p in partes if p]
 
-        try:
-            inicio_str, fin_str = bloque['timestamp'].split(' --> ')
-            inicio = _parse_time(inicio_str)
-            fin = _parse_time(fin_str)
-            duracion_total = fin - inicio
-            duracion_por_parte = duracion_total / len(partes)
-        except (ValueError, IndexError) as e:
-            print(f"❌ Error al parsear el timestamp '{bloque['timestamp']}'. Bloque omitido. Error: {e}")
-            continue
+        # Límites enteros: la suma de las partes es exactamente la duración original
+        limites = dividir_intervalo(bloque.inicio, bloque.fin, len(partes))
+        for k, parte in enumerate(partes):
+            yield Cue(None, limites[k], limites[k + 1], [parte])
 
-        current_time = inicio
-        for parte in partes:
-            fin_parte = current_time + duracion_por_parte
-            nuevo_bloque = {
-                'indice': str(nuevo_indice),
-                'timestamp': f"{_format_time(current_time)} --> {_format_time(fin_parte)}",
-                'texto': [parte]
-            }
-            nuevos_bloques.append(nuevo_bloque)
-            nuevo_indice += 1
-            current_time = fin_parte
-    
     print("✅ División y reajuste de subtítulos completado.")
-    return nuevos_bloques
 
 def guardar_srt(bloques, ruta_salida):
     print(f"💾 Guardando subtítulos censurados en: {ruta_salida}")
     try:
-        with open(ruta_salida, "w", encoding="utf-8") as f:
-            for bloque in bloques:
-                f.write(f"{bloque['indice']}\n")
-                f.write(f"{bloque['timestamp']}\n")
-                for linea in bloque['texto']:
-                    f.write(f"{linea}\n")
-                f.write("\n")
-        print("✅ Archivo SRT censurado y dividido guardado con éxito.")
+        total = escribir_cues(bloques, ruta_salida)
+        print(f"✅ Archivo SRT censurado y dividido guardado con éxito ({total} bloques).")
     except Exception as e:
         print(f"❌ Error al guardar el archivo: {e}")
 
+# ==============================================================================
+# GENERACIÓN DIRECTA DESDE LOS SEGMENTOS DE WHISPER
+# ==============================================================================
+
+def cues_desde_segmentos(segmentos, max_chars=None, max_lineas=2):
+    """Arma los cues directamente desde los segmentos de Whisper, sin pasar por un SRT.
+
+    - Las líneas se llenan de forma greedy hasta `max_chars` (un solo recorrido).
+    - Un cue se cierra al llenar `max_lineas` o al terminar el segmento.
+    - Cada censura (##) sale como cue propio con los tiempos de su palabra,
+      en lugar de repartir la duración del cue en partes iguales.
+    """
+    max_chars = max_chars or config_subtitulos()["max_characters_per_line"]
+
+    for segmento in segmentos:
+        lineas, linea = [], ""
+        inicio = fin = None
+
+        def cerrar():
+            nonlocal lineas, linea, inicio
+            if linea:
+                lineas.append(linea)
+            cue = Cue(None, inicio, fin, lineas) if lineas else None
+            lineas, linea, inicio = [], "", None
+            return cue
+
+        for texto, desde, hasta in palabras_de_segmento(segmento):
+            if CENSURA_RE.search(texto):
+                cue = cerrar()
+                if cue:
+                    yield cue
+                yield Cue(None, desde, hasta, [texto])
+                continue
+
+            if linea and len(linea) + 1 + len(texto) > max_chars:
+                if len(lineas) + 1 == max_lineas:
+                    yield cerrar()
+                else:
+                    lineas.append(linea)
+                    linea = ""
+            if inicio is None:
+                inicio = desde
+            linea = f"{linea} {texto}" if linea else texto
+            fin = hasta
+
+        cue = cerrar()
+        if cue:
+            yield cue
+
+
+def generar_subtitulos(segmentos, ruta_salida, max_chars=None):
+    """Escribe el SRT/VTT de una transcripción en una sola pasada. Devuelve la cantidad de cues."""
+    print(f"💬 Generando subtítulos desde la transcripción en: {ruta_salida}")
+    total = escribir_cues(cues_desde_segmentos(segmentos, max_chars), ruta_salida)
+    print(f"✅ {total} subtítulos generados.")
+    return total
+
 # ==============================================================================
 # INTEGRACIÓN CON DAVINCI RESOLVE
 # ==============================================================================
@@ -164,7 +246,7 @@ def importar_a_davinci(ruta_archivo):
         print("✅ Subtítulos importados a DaVinci Resolve.")
 
         # Aplicar estilos globales al track
-        aplicar_estilos_globales(proyecto, CONFIG)
+        aplicar_estilos_globales(proyecto, config_subtitulos())
 
     except ImportError:
         print("⚠️ No se encontró 'DaVinciResolveScript'. Importa el SRT manualmente.")
@@ -194,14 +276,15 @@ def aplicar_estilos_globales(proyecto, config):
 # ==============================================================================
 if __name__ == "__main__":
     archivo_original = "ejemplo.srt"
-    
-    bloques_originales = leer_srt(archivo_original)
-    
-    if bloques_originales:
-        contar_caracteres_por_linea(bloques_originales)
-        bloques_modificados = dividir_y_reajustar_subtitulos(bloques_originales)
-        
-        archivo_salida = "ejemplo_dividido.srt"
-        guardar_srt(bloques_modificados, archivo_salida)
-        
+    archivo_salida = "ejemplo_dividido.srt"
+
+    # Pipeline en streaming: cada cue pasa por todas las etapas sin cargar el archivo entero
+    if os.path.exists(archivo_original):
+        cues = iter_cues(archivo_original)
+        cues = contar_caracteres_por_linea(cues)
+        cues = dividir_y_reajustar_subtitulos(cues)
+        guardar_srt(cues, archivo_salida)
+
         importar_a_davinci(archivo_salida)
+    else:
+        print(f"❌ Error: El archivo {archivo_original} no fue encontrado.")
@@ -0,0 +1,149 @@
+# agents/timecode.py = Núcleo de tiempos en milisegundos y frames
+
+#--------------------------------------
+# Objetivos:
+# - Un solo lugar para parsear y formatear tiempos (SRT, VTT, timecode).
+# - Trabajar siempre con enteros (ms o frames): sin timedelta ni deriva de floats.
+# - Conversiones exactas según el frame rate, incluido NTSC y drop frame.
+
+import re
+from fractions import Fraction
+
+# HH:MM:SS,mmm (SRT) o [HH:]MM:SS.mmm (VTT)
+PATRON_TIEMPO = r"(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})"
+_TIEMPO_RE = re.compile(PATRON_TIEMPO)
+
+# Frame rates NTSC: el valor nominal se redondea, el real es nominal * 1000/1001
+_FPS_NTSC = {
+    23.976: Fraction(24000, 1001),
+    29.97: Fraction(30000, 1001),
+    47.952: Fraction(48000, 1001),
+    59.94: Fraction(60000, 1001),
+}
+
+
+# --- MILISEGUNDOS ---
+
+def ms_desde_partes(h, m, s, ms) -> int:
+    # "5" en la parte de milisegundos de un VTT irregular significa 500 ms
+    return ((int(h or 0) * 60 + int(m)) * 60 + int(s)) * 1000 + int(ms.ljust(3, "0"))
+
+
+def parse_ms(texto: str) -> int:
+    """"00:01:02,345" (o la variante VTT) -> 62345."""
+    # Camino rápido para el caso común de ancho fijo HH:MM:SS,mmm
+    if len(texto) == 12 and texto[2] == ":" and texto[5] == ":" and texto[8] in ",.":
+        return ((int(texto[0:2]) * 60 + int(texto[3:5])) * 60 + int(texto[6:8])) * 1000 + int(texto[9:12])
+    match = _TIEMPO_RE.match(texto.strip())
+    if not match:
+        raise ValueError(f"Timestamp inválido: {texto!r}")
+    return ms_desde_partes(*match.groups())
+
+
+def format_ms(ms: int, separador: str = ",") -> str:
+    """62345 -> "00:01:02,345" ("." como separador para VTT)."""
+    segundos, ms = divmod(ms, 1000)
+    minutos, segundos = divmod(segundos, 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas:02}:{minutos:02}:{segundos:02}{separador}{ms:03}"
+
+
+def segundos_a_ms(segundos: float) -> int:
+    return round(segundos * 1000)
+
+
+def ms_a_segundos(ms: int) -> float:
+    return ms / 1000
+
+
+def segundos_desde_valor(valor) -> float:
+    """Tiempo tal como llega en un JSON -> segundos.
+
+    Acepta números (62.3), "62.3", "01:02", "00:01:02" y "00:01:02,345".
+    Lanza ValueError si el texto no es un tiempo.
+    """
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).strip()
+    if ":" not in texto:
+        return float(texto)
+    partes = texto.replace(",", ".").split(":")
+    if len(partes) > 3:
+        raise ValueError(f"Timestamp inválido: {valor!r}")
+    segundos = 0.0
+    for parte in partes:
+        segundos = segundos * 60 + float(parte)
+    return segundos
+
+
+def dividir_intervalo(inicio: int, fin: int, partes: int) -> list[int]:
+    """Límites enteros de `partes` tramos iguales de [inicio, fin].
+
+    Cada límite se calcula desde el inicio (no sumando duraciones), así el
+    último coincide siempre con `fin` y no se acumula error.
+    """
+    duracion = fin - inicio
+    return [inicio + duracion * k // partes for k in range(partes + 1)]
+
+
+# --- FRAMES Y TIMECODE ---
+
+def fps_exacto(fps) -> Fraction:
+    """Devuelve el frame rate como fracción exacta (29.97 -> 30000/1001)."""
+    if isinstance(fps, Fraction):
+        return fps
+    fps = float(fps)
+    for nominal, exacto in _FPS_NTSC.items():
+        if abs(fps - nominal) < 0.01:
+            return exacto
+    return Fraction(fps).limit_denominator(1001)
+
+
+def es_drop_frame(fps) -> bool:
+    fps = fps_exacto(fps)
+    return fps.denominator == 1001 and round(fps) in (30, 60)
+
+
+def segundos_a_frames(segundos: float, fps) -> int:
+    # Se pasa por Fraction para que el redondeo no dependa del error del float
+    return round(Fraction(segundos).limit_denominator(1_000_000) * fps_exacto(fps))
+
+
+def ms_a_frames(ms: int, fps) -> int:
+    return round(Fraction(ms, 1000) * fps_exacto(fps))
+
+
+def frames_a_ms(frames: int, fps) -> int:
+    return round(Fraction(frames * 1000) / fps_exacto(fps))
+
+
+def frames_a_timecode(frames: int, fps, drop_frame: bool = False) -> str:
+    """HH:MM:SS:FF (o HH:MM:SS;FF en drop frame) para un número de frames."""
+    nominal = round(fps_exacto(fps))
+    if drop_frame:
+        # Drop frame: se saltean 2 (o 4 a 59.94) números de frame por minuto, salvo cada 10 minutos
+        saltos = 2 * nominal // 30
+        frames_10min = nominal * 600 - saltos * 9
+        frames_min = nominal * 60 - saltos
+        bloques, resto = divmod(frames, frames_10min)
+        frames += saltos * 9 * bloques
+        if resto > saltos:
+            frames += saltos * ((resto - saltos) // frames_min)
+    ff = frames % nominal
+    ss = frames // nominal % 60
+    mm = frames // (nominal * 60) % 60
+    hh = frames // (nominal * 3600)
+    sep = ";" if drop_frame else ":"
+    return f"{hh:02}:{mm:02}:{ss:02}{sep}{ff:02}"
+
+
+def timecode_a_frames(timecode: str, fps, drop_frame: bool = False) -> int:
+    """Inversa de frames_a_timecode."""
+    hh, mm, ss, ff = (int(p) for p in timecode.replace(";", ":").split(":"))
+    nominal = round(fps_exacto(fps))
+    frames = ((hh * 60 + mm) * 60 + ss) * nominal + ff
+    if drop_frame:
+        saltos = 2 * nominal // 30
+        minutos = hh * 60 + mm
+        frames -= saltos * (minutos - minutos // 10)
+    return frames
@@ -1,20 +1,336 @@
 # agents/transcriber.py
 import os
-import whisper
-from moviepy.editor import VideoFileClip, AudioFileClip
+import re
 import json
 import time
+import threading
+import subprocess
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
+from config import MODEL_SIZE, LANGUAGE, VIDEO_EXTS, AUDIO_EXTS
+from agents.vad import detectar_silencios, MapaVoz
+from agents.timecode import segundos_a_ms, ms_a_segundos
+from agents.indice_palabras import indexar_transcripcion
+from agents.backends import crear_backend, DEFAULT_BACKEND
+from agents.metricas import span
 
 
-MODEL_SIZE = "large-v3"
+# Whisper trabaja a 16 kHz mono
+SAMPLE_RATE = 16000
 
+# --- MODO POR VENTANAS (grabaciones largas) ---
+CHUNK_S = 600            # duración objetivo de cada ventana
+CHUNK_OVERLAP_S = 5      # solapamiento a cada lado del corte
+CHUNK_SEARCH_S = 60      # margen alrededor del objetivo para buscar un silencio
+CHUNK_WORKERS = 2
 
 
+# --- CACHÉ DE MODELOS ---
+# Cada modelo se carga una sola vez por proceso. La clave es (motor, tamaño, dispositivo, precisión,
+# opciones del motor), así un mismo proceso puede tener por ejemplo large-v3 en GPU y small en CPU.
+_MODELOS = {}
+_MODELOS_LOCK = threading.Lock()
+
+
+def get_model(model_size: str = MODEL_SIZE, device: str | None = None, fp16: bool | None = None,
+              backend: str = DEFAULT_BACKEND, backend_options: dict | None = None):
+    """Devuelve (motor, lock) para la combinación pedida, cargando el modelo solo la primera vez.
+
+    El motor (ver agents/backends.py) expone transcribe(audio, word_timestamps) con el
+    esquema de salida de openai-whisper.
+    """
+    backend_options = backend_options or {}
+    clave = (backend, model_size, device, fp16, tuple(sorted(backend_options.items())))
+
+    with _MODELOS_LOCK:
+        entrada = _MODELOS.get(clave)
+        if entrada is None:
+            print(f"--- [Transcriptor] Cargando modelo {model_size} con {backend}... ---")
+            inicio = time.perf_counter()
+            with span("cargar_modelo", backend=backend, modelo=model_size):
+                motor = crear_backend(backend, model_size, device, fp16, LANGUAGE, **backend_options)
+            # El lock por modelo evita dos transcribe() simultáneos sobre los mismos pesos
+            entrada = (motor, threading.Lock())
+            _MODELOS[clave] = entrada
+            print(f"--- [Transcriptor] Modelo cargado en {time.perf_counter() - inicio:.1f} s ({motor.describir()}) ---")
+    return entrada
+
+
+def unload_models():
+    """Libera todos los modelos en caché (útil en tests o al cambiar de GPU)."""
+    with _MODELOS_LOCK:
+        _MODELOS.clear()
+
+
+# --- POOL DE TRANSCRIPCIÓN ---
+
+class TranscriptionPool:
+    """Pool de workers de transcripción con el modelo ya cargado en memoria.
+
+    El orquestador crea el pool una vez y le pasa trabajos con submit(); cada
+    trabajo devuelve un Future con la ruta del JSON de transcripción.
+    """
+
+    def __init__(self, workers: int = 1, model_size: str = MODEL_SIZE,
+                 device: str | None = None, fp16: bool | None = None, word_timestamps: bool = False,
+                 word_index: bool = False, backend: str = DEFAULT_BACKEND, backend_options: dict | None = None,
+                 solo_voz: bool = False, chunked: bool = False):
+        self.model_size = model_size
+        self.device = device
+        self.fp16 = fp16
+        self.backend = backend
+        self.backend_options = backend_options
+        self.word_timestamps = word_timestamps
+        self.word_index = word_index
+        self.solo_voz = solo_voz
+        self.chunked = chunked
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcriptor")
+        # Precalentar: la carga del modelo ocurre ahora y no con el primer archivo.
+        # En modo por ventanas el modelo vive en los procesos del pool de ventanas, que
+        # se crea una vez y dura todo el lote
+        self._pool_ventanas = None
+        if chunked:
+            self._pool_ventanas = crear_pool_ventanas(model_size, device, fp16, backend, backend_options)
+        else:
+            self._executor.submit(get_model, model_size, device, fp16, backend, backend_options).result()
+
+    def submit(self, clip_path: str, output_dir: str):
+        return self._executor.submit(
+            transcribe_clip_detailed, clip_path, output_dir,
+            model_size=self.model_size, device=self.device, fp16=self.fp16,
+            word_timestamps=self.word_timestamps, word_index=self.word_index,
+            backend=self.backend, backend_options=self.backend_options, solo_voz=self.solo_voz,
+            chunked=self.chunked, pool_ventanas=self._pool_ventanas
+        )
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+        if self._pool_ventanas is not None:
+            self._pool_ventanas.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+
+
+
+# --- EXTRACCIÓN DE AUDIO ---
+
+def probe_duration(clip_path: str) -> float:
+    """Lee la duración desde los metadatos del contenedor, sin decodificar nada."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        clip_path,
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True, text=True).stdout.strip()
+    return float(out) if out and out != "N/A" else 0.0
+
+
+def load_audio_buffer(clip_path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decodifica la pista de audio una sola vez, directo a un buffer float32 mono.
+
+    FFmpeg escribe las muestras por stdout y se leen sin pasar por disco.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", clip_path,
+        "-vn", "-f", "f32le", "-ac", "1", "-ar", str(sample_rate),
+        "-",
+    ]
+    proc = subprocess.run(cmd, capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"FFmpeg no pudo decodificar el audio: {proc.stderr.decode(errors='ignore')[-500:]}")
+    return np.frombuffer(proc.stdout, dtype=np.float32)
+
+
+def _write_temp_audio(clip_path: str, temp_audio_path: str) -> float:
+    # Modo clásico: moviepy escribe un WAV temporal que Whisper vuelve a decodificar.
+    # Import tardío: solo este camino necesita moviepy
+    from moviepy.editor import VideoFileClip, AudioFileClip
+    ext = os.path.splitext(clip_path)[1].lower()
+    if ext in VIDEO_EXTS:  # Archivos de video
+        with VideoFileClip(clip_path) as video_clip:
+            video_clip.audio.write_audiofile(temp_audio_path, codec="pcm_s16le", logger=None)
+            return video_clip.duration
+    # Archivos de audio: normalizamos a WAV 16-bit para Whisper
+    with AudioFileClip(clip_path) as audio_clip:
+        audio_clip.write_audiofile(temp_audio_path, codec="pcm_s16le", logger=None)
+        return audio_clip.duration
+
+
+# --- TRANSCRIPCIÓN POR VENTANAS ---
+
+def plan_chunks(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, chunk_s: float = CHUNK_S,
+                search_s: float = CHUNK_SEARCH_S) -> list[float]:
+    """Devuelve los puntos de corte (en segundos), incluyendo 0 y el final del audio.
+
+    Cada corte cae en el centro del silencio más cercano al objetivo; si no hay
+    silencio dentro del margen, se corta justo en el objetivo.
+    """
+    total_s = len(audio) / sample_rate
+    if total_s <= chunk_s:
+        return [0.0, total_s]
+
+    centros = [(a + b) / 2 for a, b in detectar_silencios(audio, sample_rate)]
+    cortes = [0.0]
+    while total_s - cortes[-1] > chunk_s:
+        objetivo = cortes[-1] + chunk_s
+        candidatos = [c for c in centros if abs(c - objetivo) <= search_s and c > cortes[-1]]
+        cortes.append(min(candidatos, key=lambda c: abs(c - objetivo)) if candidatos else objetivo)
+    cortes.append(total_s)
+    return cortes
+
+
+def _init_chunk_worker(model_size, device, fp16, backend, backend_options):
+    # Cada proceso del pool carga su modelo una vez al arrancar
+    get_model(model_size, device, fp16, backend, backend_options)
+
+
+def _transcribe_chunk(audio: np.ndarray, offset_s: float, model_size, device, fp16,
+                      word_timestamps: bool = False, backend: str = DEFAULT_BACKEND,
+                      backend_options: dict | None = None) -> list[dict]:
+    model, model_lock = get_model(model_size, device, fp16, backend, backend_options)
+    with model_lock:
+        result = model.transcribe(audio, word_timestamps=word_timestamps)
+
+    # Pasar los tiempos locales de la ventana a tiempo global del archivo. El desplazamiento
+    # se suma en milisegundos enteros para no arrastrar error de float entre ventanas.
+    offset_ms = segundos_a_ms(offset_s)
+    segments = result.get("segments", [])
+    for item in segments + [w for seg in segments for w in seg.get("words", [])]:
+        item["start"] = ms_a_segundos(segundos_a_ms(item["start"]) + offset_ms)
+        item["end"] = ms_a_segundos(segundos_a_ms(item["end"]) + offset_ms)
+    return segments
+
+
+def _palabras(seg: dict) -> str:
+    # Texto normalizado y rodeado de espacios para buscar palabras completas
+    return " " + " ".join(re.findall(r"\w+", seg.get("text", "").lower())) + " "
+
+
+def _contenido(anterior: dict, seg: dict) -> int:
+    """Cómo se relacionan dos segmentos consecutivos que se pisan en el tiempo.
+
+    1 si el texto de `seg` ya está dentro de `anterior` (copia: se descarta), -1 si
+    `anterior` está dentro de `seg` (el anterior quedó truncado en el borde de su
+    ventana: gana `seg`), 0 si no se pisan o el texto es distinto (se quedan los dos).
+    El solape de tiempo solo no alcanza: un segmento truncado en el borde de la ventana
+    se pisa con la continuación real que transcribió la ventana siguiente.
+    """
+    if min(anterior["end"], seg["end"]) <= max(anterior["start"], seg["start"]):
+        return 0
+    texto_anterior, texto = _palabras(anterior), _palabras(seg)
+    if texto in texto_anterior:
+        return 1
+    if texto_anterior in texto:
+        return -1
+    return 0
+
+
+def stitch_chunks(chunk_segments: list[list[dict]], cortes: list[float]) -> list[dict]:
+    """Une los segmentos de cada ventana sin duplicar el texto de los solapamientos.
+
+    Se decide por corte y no por ventana: de cada lado del corte_i se toman los
+    segmentos que empiezan en su tramo [corte_i, corte_i+1), así uno que cruza el
+    corte queda en la ventana donde empieza (que lo transcribió completo gracias al
+    solapamiento). Después se descartan las copias que la ventana vecina partió
+    distinto: solo si además de pisarse en el tiempo una contiene el texto de la otra.
+    """
+    candidatos = []
+    for i, segments in enumerate(chunk_segments):
+        desde, hasta = cortes[i], cortes[i + 1]
+        primero, ultimo = i == 0, i == len(chunk_segments) - 1
+        for seg in segments:
+            if (primero or seg["start"] >= desde) and (ultimo or seg["start"] < hasta):
+                candidatos.append(seg)
+
+    candidatos.sort(key=lambda seg: seg["start"])
+    merged = []
+    for seg in candidatos:
+        relacion = _contenido(merged[-1], seg) if merged else 0
+        if relacion == 1:
+            continue
+        if relacion == -1:
+            merged[-1] = seg
+        else:
+            merged.append(seg)
+    for idx, seg in enumerate(merged):
+        seg["id"] = idx
+    return merged
+
+
+def crear_pool_ventanas(model_size: str = MODEL_SIZE, device: str | None = None, fp16: bool | None = None,
+                        backend: str = DEFAULT_BACKEND, backend_options: dict | None = None,
+                        workers: int = CHUNK_WORKERS) -> ProcessPoolExecutor:
+    """Pool de procesos para las ventanas; cada proceso carga el modelo una vez al arrancar."""
+    # "spawn" porque CUDA no sobrevive a un fork
+    ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_chunk_worker,
+                               initargs=(model_size, device, fp16, backend, backend_options))
+
+
+def transcribe_chunked(audio: np.ndarray, model_size: str = MODEL_SIZE, device: str | None = None,
+                       fp16: bool | None = None, chunk_s: float = CHUNK_S,
+                       overlap_s: float = CHUNK_OVERLAP_S, workers: int = CHUNK_WORKERS,
+                       word_timestamps: bool = False, backend: str = DEFAULT_BACKEND,
+                       backend_options: dict | None = None, pool: ProcessPoolExecutor | None = None) -> dict:
+    """Transcribe el audio en ventanas solapadas repartidas en un pool de procesos.
+
+    Con `pool` (ver crear_pool_ventanas) se reutilizan procesos con el modelo ya cargado;
+    sin él se crea un pool solo para esta llamada.
+    """
+    cortes = plan_chunks(audio, SAMPLE_RATE, chunk_s)
+    total_s = len(audio) / SAMPLE_RATE
+    print(f"--- [Transcriptor] Modo por ventanas: {len(cortes) - 1} ventanas, {workers} procesos ---")
+
+    ventanas = []
+    for desde, hasta in zip(cortes, cortes[1:]):
+        inicio_s = max(0.0, desde - overlap_s)
+        fin_s = min(total_s, hasta + overlap_s)
+        ventanas.append((inicio_s, audio[int(inicio_s * SAMPLE_RATE):int(fin_s * SAMPLE_RATE)]))
+
+    propio = pool is None
+    if propio:
+        pool = crear_pool_ventanas(model_size, device, fp16, backend, backend_options, workers)
+    try:
+        futures = [
+            pool.submit(_transcribe_chunk, chunk, inicio_s, model_size, device, fp16, word_timestamps,
+                        backend, backend_options)
+            for inicio_s, chunk in ventanas
+        ]
+        chunk_segments = [f.result() for f in futures]
+    finally:
+        if propio:
+            pool.shutdown()
+
+    segments = stitch_chunks(chunk_segments, cortes)
+    return {"text": "".join(seg.get("text", "") for seg in segments), "segments": segments}
+
+
+def transcribe_clip_detailed(clip_path: str, output_dir: str, model_size: str = MODEL_SIZE,
+                             device: str | None = None, fp16: bool | None = None,
+                             in_memory: bool = True, chunked: bool = False,
+                             chunk_s: float = CHUNK_S, workers: int = CHUNK_WORKERS,
+                             word_timestamps: bool = False, word_index: bool = False,
+                             backend: str = DEFAULT_BACKEND, backend_options: dict | None = None,
+                             solo_voz: bool = False, pool_ventanas: ProcessPoolExecutor | None = None) -> str:
+    """Transcribe el clip y guarda <clip>_transcription.json en `output_dir`.
+
+    Con `solo_voz` se transcriben solo los tramos con voz (ver MapaVoz en agents/vad.py):
+    los silencios largos no pasan por el modelo, los tiempos se devuelven en el tiempo
+    del archivo original y el mapa queda en el JSON bajo "mapa_voz".
+    """
 
-def transcribe_clip_detailed(clip_path: str, output_dir: str) -> str:
-    
     print(f"--- [Transcriptor] Iniciando para: {os.path.basename(clip_path)} ---")
+    # El índice de palabras necesita los tiempos por palabra de Whisper
+    word_timestamps = word_timestamps or word_index
 
     if not os.path.exists(clip_path):
         raise FileNotFoundError(f"El archivo no se encontró en: {clip_path}")
@@ -24,25 +340,51 @@ def transcribe_clip_detailed(clip_path: str, output_dir: str) -> str:
     temp_audio_path = os.path.join(output_dir, f"temp_audio_{os.path.basename(clip_path)}.wav")
 
     video_duration = 0
+    mapa_voz = None
     try:
-        if ext in [".mp4", ".mov", ".avi", ".mkv"]:  # Archivos de video
-            with VideoFileClip(clip_path) as video_clip:
-                video_duration = video_clip.duration
-                video_clip.audio.write_audiofile(temp_audio_path, codec="pcm_s16le", logger=None)
-        elif ext in [".wav", ".mp3"]:  # Archivos de audio
-            with AudioFileClip(clip_path) as audio_clip:
-                video_duration = audio_clip.duration
-                # Normalizamos a WAV 16-bit para Whisper
-                audio_clip.write_audiofile(temp_audio_path, codec="pcm_s16le", logger=None)
-        else:
+        if ext not in VIDEO_EXTS + AUDIO_EXTS:
             raise ValueError(f"Formato no soportado: {ext}")
+        with span("extraer_audio", archivo=os.path.basename(clip_path)):
+            if in_memory or chunked or solo_voz:
+                # Un solo decodificado: FFmpeg -> buffer 16 kHz -> Whisper, sin WAV temporal
+                video_duration = probe_duration(clip_path)
+                audio_input = load_audio_buffer(clip_path)
+            else:
+                video_duration = _write_temp_audio(clip_path, temp_audio_path)
+                audio_input = temp_audio_path
     except Exception as e:
-        print(f"Advertencia: No se pudo procesar {clip_path}. Error: {e}")
-        result = {"text": "", "segments": []}
+        # Sin audio no hay transcripción: se propaga el error para que el orquestador no guarde
+        # en caché ni marque como completa una transcripción vacía
+        if os.path.exists(temp_audio_path):
+            os.remove(temp_audio_path)
+        raise RuntimeError(f"No se pudo extraer el audio de {clip_path}: {e}") from e
     else:
-        model = whisper.load_model(MODEL_SIZE)
-        result = model.transcribe(temp_audio_path, language="es")
-    
+        duracion_modelo = video_duration
+        if solo_voz:
+            # La misma pasada de energía del VAD decide qué llega al modelo
+            with span("mapa_voz", archivo=os.path.basename(clip_path)):
+                mapa_voz = MapaVoz.desde_audio(audio_input)
+                audio_input = mapa_voz.recortar(audio_input)
+            duracion_modelo = mapa_voz.duracion_condensada
+            print(f"--- [Transcriptor] Solo voz: {duracion_modelo:.0f} s de {mapa_voz.duracion_s:.0f} s "
+                  f"({mapa_voz.ahorro():.0%} menos audio) ---")
+
+        if solo_voz and len(audio_input) == 0:
+            result = {"text": "", "segments": []}
+        elif chunked:
+            with span("transcribir", archivo=os.path.basename(clip_path), duracion_s=duracion_modelo, modo="ventanas"):
+                result = transcribe_chunked(audio_input, model_size, device, fp16, chunk_s=chunk_s, workers=workers,
+                                            word_timestamps=word_timestamps, backend=backend,
+                                            backend_options=backend_options, pool=pool_ventanas)
+        else:
+            model, model_lock = get_model(model_size, device, fp16, backend, backend_options)
+            with model_lock, span("transcribir", archivo=os.path.basename(clip_path), duracion_s=duracion_modelo):
+                result = model.transcribe(audio_input, word_timestamps=word_timestamps)
+
+        if mapa_voz is not None:
+            # Del tiempo del audio condensado al del archivo original
+            result["segments"] = mapa_voz.remapear(result.get("segments", []))
+
     # Limpiar el archivo temporal
     if os.path.exists(temp_audio_path):
         os.remove(temp_audio_path)
@@ -53,6 +395,8 @@ def transcribe_clip_detailed(clip_path: str, output_dir: str) -> str:
         "full_text": result.get("text", "") if result else "",
         "dialogue_segments": result.get("segments", []) if result else []
     }
+    if mapa_voz is not None:
+        final_output["mapa_voz"] = mapa_voz.como_dict()
 
     clip_name = os.path.splitext(os.path.basename(clip_path))[0]
     output_json_path = os.path.join(output_dir, f"{clip_name}_transcription.json")
@@ -60,7 +404,9 @@ def transcribe_clip_detailed(clip_path: str, output_dir: str) -> str:
     with open(output_json_path, "w", encoding="utf-8") as f:
         json.dump(final_output, f, ensure_ascii=False, indent=4)
 
+    if word_index:
+        # <clip>_transcription.idx: consultas por tiempo y por frase sin recorrer los segmentos
+        indexar_transcripcion(final_output["dialogue_segments"], output_json_path)
+
     print(f"--- [Transcriptor] Finalizado para: {os.path.basename(clip_path)} ---")
     return output_json_path
-
-
@@ -0,0 +1,189 @@
+# agents/vad.py = Detección de voz/silencio por energía
+
+#--------------------------------------
+# Objetivos:
+# - Medir la energía del audio decodificado en tramas cortas.
+# - Encontrar los tramos de silencio donde se puede cortar sin partir una frase.
+# - Armar el mapa de voz: qué tramos tienen voz y cómo pasar del tiempo "condensado"
+#   (solo voz, sin silencios largos) al tiempo del archivo original y viceversa.
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from agents.timecode import segundos_a_ms, ms_a_segundos, segundos_desde_valor
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+# Por debajo de este nivel (dBFS) una trama se considera silencio
+SILENCE_DB = -40.0
+MIN_SILENCE_S = 0.5
+
+# Mapa de voz: solo se quitan los silencios de al menos MIN_SILENCIO_VOZ_S, y de cada uno
+# se deja MARGEN_VOZ_S a cada lado para no comerse el principio o el final de una palabra
+MIN_SILENCIO_VOZ_S = 1.0
+MARGEN_VOZ_S = 0.25
+
+
+def energia_por_trama(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """Devuelve el nivel RMS en dBFS de cada trama de `frame_ms` milisegundos."""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_tramas = len(audio) // frame_len
+    if n_tramas == 0:
+        return np.zeros(0, dtype=np.float32)
+    tramas = audio[:n_tramas * frame_len].reshape(n_tramas, frame_len)
+    rms = np.sqrt(np.mean(np.square(tramas, dtype=np.float32), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def _tramos(mascara: np.ndarray, frame_s: float, min_len_s: float) -> list[tuple[float, float]]:
+    # Convierte una máscara booleana por trama en tramos (inicio_s, fin_s) contiguos
+    if not mascara.any():
+        return []
+    bordes = np.diff(mascara.astype(np.int8), prepend=0, append=0)
+    inicios = np.flatnonzero(bordes == 1)
+    fines = np.flatnonzero(bordes == -1)
+    return [
+        (float(i * frame_s), float(f * frame_s))
+        for i, f in zip(inicios, fines)
+        if (f - i) * frame_s >= min_len_s
+    ]
+
+
+def detectar_silencios(audio: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                       umbral_db: float = SILENCE_DB, min_silencio_s: float = MIN_SILENCE_S) -> list[tuple[float, float]]:
+    """Devuelve los tramos de silencio (inicio_s, fin_s) de al menos `min_silencio_s` segundos."""
+    energia = energia_por_trama(audio, sample_rate)
+    return _tramos(energia < umbral_db, FRAME_MS / 1000, min_silencio_s)
+
+
+# --- MAPA DE VOZ ---
+
+class MapaVoz:
+    """Tramos con voz de un archivo, en orden, y la conversión entre tiempos.
+
+    El audio condensado es la concatenación de los tramos con voz. Los tiempos se
+    guardan en milisegundos enteros y se buscan con bisect: remapear miles de
+    segmentos no acumula error de float ni recorre la lista de tramos.
+    """
+
+    def __init__(self, tramos: list[tuple[float, float]], duracion_s: float):
+        self.duracion_s = duracion_s
+        self._tramos_ms = [(segundos_a_ms(a), segundos_a_ms(b)) for a, b in tramos]
+        self._inicios_fuente = [a for a, _ in self._tramos_ms]
+        # Inicio de cada tramo en el tiempo condensado
+        self._inicios_condensado = []
+        acumulado = 0
+        for a, b in self._tramos_ms:
+            self._inicios_condensado.append(acumulado)
+            acumulado += b - a
+        self._duracion_condensada_ms = acumulado
+
+    @classmethod
+    def desde_audio(cls, audio: np.ndarray, sample_rate: int = SAMPLE_RATE, umbral_db: float = SILENCE_DB,
+                    min_silencio_s: float = MIN_SILENCIO_VOZ_S, margen_s: float = MARGEN_VOZ_S) -> "MapaVoz":
+        """Arma el mapa a partir del audio decodificado (la misma pasada de energía del VAD)."""
+        duracion_s = len(audio) / sample_rate
+        frame_s = FRAME_MS / 1000
+        tramos, cursor = [], 0.0
+        for inicio, fin in detectar_silencios(audio, sample_rate, umbral_db, min_silencio_s):
+            # Un silencio al principio o al final del archivo se quita entero
+            corte_desde = 0.0 if inicio <= 0 else inicio + margen_s
+            corte_hasta = duracion_s if fin >= duracion_s - frame_s else fin - margen_s
+            if corte_hasta <= corte_desde:
+                continue
+            if corte_desde > cursor:
+                tramos.append((cursor, corte_desde))
+            cursor = corte_hasta
+        if cursor < duracion_s:
+            tramos.append((cursor, duracion_s))
+        return cls(tramos, duracion_s)
+
+    @classmethod
+    def desde_dict(cls, datos: dict) -> "MapaVoz":
+        return cls([tuple(t) for t in datos["tramos"]], datos["duracion_s"])
+
+    def como_dict(self) -> dict:
+        return {"duracion_s": self.duracion_s, "tramos": [list(t) for t in self.tramos]}
+
+    @property
+    def tramos(self) -> list[tuple[float, float]]:
+        return [(ms_a_segundos(a), ms_a_segundos(b)) for a, b in self._tramos_ms]
+
+    @property
+    def duracion_condensada(self) -> float:
+        return ms_a_segundos(self._duracion_condensada_ms)
+
+    def ahorro(self) -> float:
+        """Fracción del archivo que se descarta (0.3 = 30 % menos de audio)."""
+        if not self.duracion_s:
+            return 0.0
+        return 1 - self.duracion_condensada / self.duracion_s
+
+    def recortar(self, audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+        """Devuelve solo las muestras de los tramos con voz, una detrás de otra."""
+        if not self._tramos_ms:
+            return audio[:0]
+        return np.concatenate([audio[a * sample_rate // 1000:b * sample_rate // 1000] for a, b in self._tramos_ms])
+
+    # --- Conversión de tiempos ---
+
+    def a_fuente(self, t: float, fin: bool = False) -> float:
+        """Tiempo condensado -> tiempo del archivo original.
+
+        Un instante justo en la unión de dos tramos es ambiguo: como final de un
+        segmento (`fin=True`) se lleva al final del tramo anterior y no al inicio
+        del siguiente, así el segmento no se estira sobre el silencio quitado.
+        """
+        if not self._tramos_ms:
+            return t
+        ms = segundos_a_ms(t)
+        buscar = bisect_left if fin else bisect_right
+        i = max(0, buscar(self._inicios_condensado, ms) - 1)
+        inicio, final = self._tramos_ms[i]
+        # Pasado el último tramo no hay otro al que saltar: se limita al final del archivo
+        limite = final if i + 1 < len(self._tramos_ms) else segundos_a_ms(self.duracion_s)
+        return ms_a_segundos(min(inicio + ms - self._inicios_condensado[i], limite))
+
+    def a_condensado(self, t: float) -> float:
+        """Tiempo del archivo original -> tiempo condensado. Un silencio quitado cae en su borde."""
+        if not self._tramos_ms:
+            return t
+        ms = segundos_a_ms(t)
+        i = bisect_right(self._inicios_fuente, ms) - 1
+        if i < 0:
+            return 0.0
+        inicio, final = self._tramos_ms[i]
+        return ms_a_segundos(self._inicios_condensado[i] + min(ms, final) - inicio)
+
+    def remapear(self, items: list[dict], a_fuente: bool = True) -> list[dict]:
+        """Copia de `items` (segmentos con start/end y opcionalmente words) con los tiempos convertidos.
+
+        Con `a_fuente=True` pasa de tiempo condensado a original (transcripción y plan);
+        con False, del original al condensado (el dossier que acompaña al proxy condensado).
+        """
+        if a_fuente:
+            inicio, fin = self.a_fuente, lambda t: self.a_fuente(t, fin=True)
+        else:
+            inicio = fin = self.a_condensado
+
+        def convertir(item: dict) -> dict:
+            nuevo = dict(item)
+            if item.get("start") is not None:
+                nuevo["start"] = inicio(segundos_desde_valor(item["start"]))
+            if item.get("end") is not None:
+                nuevo["end"] = fin(segundos_desde_valor(item["end"]))
+            if "words" in item:
+                nuevo["words"] = [convertir(w) for w in item["words"]]
+            return nuevo
+
+        def convertir_o_dejar(item: dict) -> dict:
+            # Un tiempo ilegible no aborta el análisis: el bloque queda como vino
+            try:
+                return convertir(item)
+            except (TypeError, ValueError) as e:
+                print(f"--- [VAD] ⚠️ Bloque con tiempo ilegible, se deja sin remapear: {e} ---")
+                return item
+
+        return [convertir_o_dejar(item) for item in items]
@@ -0,0 +1,111 @@
+# benchmarks/bench_backends.py = Comparación de motores de transcripción
+#
+# Transcribe el mismo audio con cada motor/configuración y reporta el factor de tiempo
+# real (RTF = tiempo de transcripción / duración del audio; < 1 es más rápido que tiempo
+# real) y el pico de memoria residente. Cada configuración corre en un subproceso propio,
+# así el pico de RSS y la carga del modelo de una no contaminan a la siguiente.
+#
+# Uso (desde la raíz del proyecto):
+#     python benchmarks/bench_backends.py audio.wav [--model small]
+#         [--configs whisper faster-whisper:int8 faster-whisper:float16:batch=1] [--json salida.json]
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIGS_DEFAULT = ["whisper", "faster-whisper:int8", "faster-whisper:int8:batch=1"]
+
+
+def parsear_config(texto: str) -> tuple[str, dict]:
+    """"faster-whisper:int8:beam=1:batch=4" -> ("faster-whisper", {"compute_type": "int8", ...})."""
+    nombre, *partes = texto.split(":")
+    opciones = {}
+    for parte in partes:
+        if "=" in parte:
+            clave, valor = parte.split("=", 1)
+            clave = {"beam": "beam_size", "batch": "batch_size", "threads": "cpu_threads"}.get(clave, clave)
+            opciones[clave] = int(valor)
+        else:
+            opciones["compute_type"] = parte
+    return nombre, opciones
+
+
+def worker(ruta_audio: str, model_size: str, config: str, device: str | None) -> dict:
+    """Corre dentro del subproceso: carga, transcribe y mide."""
+    from agents.transcriber import get_model, load_audio_buffer, SAMPLE_RATE
+    # El mismo pico de RSS que reportan las métricas del pipeline (y bench_pipeline.py)
+    from agents.metricas import rss_pico_mb
+
+    backend, opciones = parsear_config(config)
+    audio = load_audio_buffer(ruta_audio)
+    duracion_s = len(audio) / SAMPLE_RATE
+
+    inicio = time.perf_counter()
+    motor, _ = get_model(model_size, device, None, backend, opciones)
+    carga_s = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultado = motor.transcribe(audio)
+    transcripcion_s = time.perf_counter() - inicio
+    pico = rss_pico_mb()
+
+    return {
+        "config": config,
+        "motor": motor.describir(),
+        "duracion_audio_s": round(duracion_s, 2),
+        "carga_s": round(carga_s, 2),
+        "transcripcion_s": round(transcripcion_s, 2),
+        "rtf": round(transcripcion_s / duracion_s, 3) if duracion_s else None,
+        "rss_pico_mb": round(pico, 1) if pico is not None else None,
+        "segmentos": len(resultado["segments"]),
+        "caracteres": len(resultado["text"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara RTF y pico de memoria de los motores de transcripción.")
+    parser.add_argument("audio", help="Archivo de audio o video a transcribir.")
+    parser.add_argument("--model", default="small", help="Tamaño del modelo (el mismo para todos los motores).")
+    parser.add_argument("--configs", nargs="+", default=CONFIGS_DEFAULT,
+                        help="motor[:compute_type][:beam=N][:batch=N][:threads=N]")
+    parser.add_argument("--device", help="cpu o cuda (por defecto, el que detecte cada motor).")
+    parser.add_argument("--json", help="Guardar los resultados en este archivo.")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.audio, args.model, args.worker, args.device)))
+        return
+
+    resultados = []
+    print(f"{args.audio} con el modelo {args.model}\n")
+    print(f"  {'configuración':<34} {'RTF':>7} {'transcr. s':>11} {'carga s':>8} {'pico RSS MB':>12}")
+    for config in args.configs:
+        cmd = [sys.executable, os.path.abspath(__file__), args.audio, "--model", args.model, "--worker", config]
+        if args.device:
+            cmd += ["--device", args.device]
+        proceso = subprocess.run(cmd, capture_output=True, text=True)
+        if proceso.returncode != 0:
+            error = (proceso.stderr.strip().splitlines() or ["sin salida"])[-1]
+            print(f"  {config:<34} falló: {error}")
+            resultados.append({"config": config, "error": error})
+            continue
+        # La última línea es el JSON; lo anterior son los prints del transcriptor
+        resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+        resultados.append(resultado)
+        print(f"  {config:<34} {resultado['rtf']:>7} {resultado['transcripcion_s']:>11} "
+              f"{resultado['carga_s']:>8} {str(resultado['rss_pico_mb']):>12}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=4)
+        print(f"\nResultados guardados en: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# benchmarks/bench_pipeline.py = Benchmark de punta a punta del orquestador sin servicios externos
+#
+# Corre run_batch() sobre clips sintéticos con Gemini y DaVinci Resolve reemplazados por
+# módulos locales con latencias configurables (benchmarks/fakes.py). Opcionalmente también
+# Whisper (--whisper-falso RTF), para medir el resto del pipeline en una máquina sin GPU.
+# Cada corrida se agrega a benchmarks/resultados/historial.jsonl y se compara con la
+# anterior de la misma configuración.
+#
+# Uso (desde la raíz del proyecto; requiere FFmpeg):
+#     python benchmarks/bench_pipeline.py [--duraciones 30 120 600] [--tipo video|audio]
+#         [--whisper-falso 0.05] [--windowed] [--solo-voz] [--export edl] [--caliente] [--etiqueta "cambio X"]
+
+import os
+import sys
+import json
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+from fixtures import fixture
+
+HISTORIAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados", "historial.jsonl")
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _correr(orchestrator, rutas, args, estado, reports_dir: str) -> dict:
+    from agents import editor
+    from agents.metricas import METRICAS
+
+    # Reportes (y manifiestos) propios de cada corrida: la corrida en caliente solo
+    # comparte la caché, si no el manifiesto saltearía todas las etapas
+    orchestrator.REPORTS_DIR = reports_dir
+    # Una sesión de Resolve nueva por corrida, como en un proceso nuevo
+    editor._sesion = None
+    llamadas_resolve = len(estado["resolve"].llamadas)
+    resumen = orchestrator.run_batch(rutas, apply_resolve=not args.sin_resolve, windowed=args.windowed,
+                                     export_format=args.export, solo_voz=args.solo_voz)
+    metricas = METRICAS.resumen()
+
+    duracion_media_s = sum(args.duraciones)
+    return {
+        "duracion_total_s": resumen["duracion_total_s"],
+        "completados": resumen["completados"],
+        "fallidos": resumen["fallidos"],
+        "archivos_por_min": round(60 * len(rutas) / resumen["duracion_total_s"], 2),
+        # Segundos de material procesados por segundo de reloj
+        "velocidad_x": round(duracion_media_s / resumen["duracion_total_s"], 2),
+        "etapas": metricas["etapas"],
+        "contadores": metricas["contadores"],
+        "recursos": metricas["recursos"],
+        # El pico del proceso (ru_maxrss) no se puede reiniciar: por corrida vale el máximo muestreado
+        "rss_max_corrida_mb": metricas["recursos"]["rss_max_muestreado_mb"],
+        "llamadas_resolve": len(estado["resolve"].llamadas) - llamadas_resolve,
+    }
+
+
+def _imprimir(nombre: str, corrida: dict, anterior: dict | None):
+    print(f"\n[{nombre}] {corrida['duracion_total_s']} s en total, {corrida['archivos_por_min']} archivos/min, "
+          f"{corrida['velocidad_x']}x tiempo real, {corrida['fallidos']} fallidos")
+    print(f"  {'tramo':<28} {'llamadas':>8} {'total s':>9} {'máx s':>8} {'vs anterior':>12}")
+    for tramo, datos in corrida["etapas"].items():
+        delta = ""
+        if anterior and tramo in anterior.get("etapas", {}) and anterior["etapas"][tramo]["total_s"]:
+            cambio = datos["total_s"] / anterior["etapas"][tramo]["total_s"] - 1
+            delta = f"{cambio:+.1%}"
+        print(f"  {tramo:<28} {datos['llamadas']:>8} {datos['total_s']:>9.3f} {datos['max_s']:>8.3f} {delta:>12}")
+    print(f"  contadores: {corrida['contadores']}")
+    print(f"  recursos: RSS máx. de la corrida {corrida['rss_max_corrida_mb']} MB "
+          f"(pico del proceso hasta acá {corrida['recursos']['rss_pico_mb']} MB), "
+          f"CPU promedio {corrida['recursos']['cpu_promedio_pct']} %")
+
+
+def _anterior(historial: str, params: dict) -> dict | None:
+    if not os.path.exists(historial):
+        return None
+    ultima = None
+    with open(historial, "r", encoding="utf-8") as f:
+        for linea in f:
+            entrada = json.loads(linea)
+            if entrada.get("params") == params:
+                ultima = entrada
+    return ultima
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta con Gemini y Resolve simulados.")
+    parser.add_argument("--duraciones", type=float, nargs="+", default=[30, 120, 600], help="Duración de cada clip (s).")
+    parser.add_argument("--tipo", choices=("video", "audio"), default="video")
+    parser.add_argument("--whisper-falso", type=float, metavar="RTF",
+                        help="Reemplazar Whisper por uno que tarda RTF * duración (sin modelo).")
+    parser.add_argument("--windowed", action="store_true", help="Análisis por ventanas.")
+    parser.add_argument("--solo-voz", action="store_true", help="Transcribir y subir solo los tramos con voz.")
+    parser.add_argument("--export", choices=("edl", "fcpxml"), help="Compilar también la timeline.")
+    parser.add_argument("--sin-resolve", action="store_true", help="No aplicar los planes en el Resolve simulado.")
+    parser.add_argument("--caliente", action="store_true", help="Repetir la corrida con la caché ya llena.")
+    parser.add_argument("--subida-s", type=float, default=0.5, help="Latencia fija de cada subida.")
+    parser.add_argument("--subida-mb-s", type=float, default=50.0, help="Ancho de banda simulado de subida (MB/s).")
+    parser.add_argument("--processing-s", type=float, default=2.0, help="Tiempo en estado PROCESSING.")
+    parser.add_argument("--generacion-s", type=float, default=3.0, help="Latencia de cada llamada de generación.")
+    parser.add_argument("--resolve-s", type=float, default=0.002, help="Latencia de cada llamada a Resolve.")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--etiqueta", default="", help="Nota libre que se guarda con el resultado.")
+    parser.add_argument("--historial", default=HISTORIAL)
+    args = parser.parse_args()
+
+    latencias = fakes.Latencias(args.subida_s, args.subida_mb_s, args.processing_s, args.generacion_s,
+                                resolve_llamada_s=args.resolve_s, jitter=args.jitter)
+    estado = fakes.instalar(latencias, whisper_rtf=args.whisper_falso)
+    # El orquestador exige la variable aunque el genai falso no la use
+    os.environ.setdefault("GEMINI_API_KEY", "falsa")
+    import orchestrator
+
+    rutas = [fixture(d, args.tipo) for d in args.duraciones]
+    params = {
+        "duraciones": args.duraciones, "tipo": args.tipo, "whisper_falso": args.whisper_falso,
+        "windowed": args.windowed, "solo_voz": args.solo_voz, "export": args.export, "resolve": not args.sin_resolve,
+        "latencias": latencias.como_dict(),
+    }
+    anterior = _anterior(args.historial, params)
+
+    # Workspace aislado: sin caché previa y sin pisar workspace/ del proyecto
+    workspace = tempfile.mkdtemp(prefix="bench_pipeline_")
+    orchestrator.CACHE_DIR = os.path.join(workspace, "cache")
+    try:
+        corridas = {"frio": _correr(orchestrator, rutas, args, estado, os.path.join(workspace, "reports_frio"))}
+        if args.caliente:
+            corridas["caliente"] = _correr(orchestrator, rutas, args, estado,
+                                           os.path.join(workspace, "reports_caliente"))
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    for nombre, corrida in corridas.items():
+        _imprimir(nombre, corrida, (anterior or {}).get("corridas", {}).get(nombre))
+
+    entrada = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "etiqueta": args.etiqueta,
+        "maquina": {"python": platform.python_version(), "plataforma": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "params": params,
+        "corridas": corridas,
+    }
+    os.makedirs(os.path.dirname(args.historial), exist_ok=True)
+    with open(args.historial, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+    print(f"\nResultado agregado a {args.historial}")
+
+
+if __name__ == "__main__":
+    main()
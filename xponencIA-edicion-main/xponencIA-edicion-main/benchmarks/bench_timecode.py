@@ -0,0 +1,117 @@
+# benchmarks/bench_timecode.py = Microbenchmark del núcleo de timecode
+#
+# Compara las funciones anteriores de subtitulos.py (timedelta) con agents/timecode.py
+# sobre un SRT sintético de 100k cues.
+#
+# Uso (desde la raíz del proyecto):
+#     python benchmarks/bench_timecode.py [--cues 100000] [--partes 3]
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.timecode import parse_ms, format_ms, dividir_intervalo
+
+
+# --- IMPLEMENTACIÓN ANTERIOR (copiada de agents/subtitulos.py) ---
+
+def _parse_time(time_str):
+    parts = time_str.replace(',', '.').split(':')
+    h = int(parts[0])
+    m = int(parts[1])
+    s, ms = map(int, parts[2].split('.'))
+    return timedelta(hours=h, minutes=m, seconds=s, milliseconds=ms)
+
+
+def _format_time(td):
+    total_seconds = int(td.total_seconds())
+    milliseconds = td.microseconds // 1000
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{milliseconds:03}"
+
+
+def _dividir_legacy(inicio, fin, partes):
+    duracion_por_parte = (fin - inicio) / partes
+    limites = [inicio]
+    for _ in range(partes):
+        limites.append(limites[-1] + duracion_por_parte)
+    return limites
+
+
+# --- FIXTURE ---
+
+def generar_srt(ruta, cues, seed=0):
+    rnd = random.Random(seed)
+    t = 0
+    with open(ruta, "w", encoding="utf-8") as f:
+        for i in range(1, cues + 1):
+            inicio = t + rnd.randint(0, 500)
+            fin = inicio + rnd.randint(700, 6000)
+            t = fin
+            f.write(f"{i}\n{format_ms(inicio)} --> {format_ms(fin)}\nTexto de ejemplo ## {i}\n\n")
+
+
+def leer_tiempos(ruta):
+    with open(ruta, "r", encoding="utf-8") as f:
+        return [linea.rstrip("\n").split(" --> ") for linea in f if "-->" in linea]
+
+
+def medir(nombre, fn, repeticiones=3):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = fn()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    print(f"  {nombre:<38} {mejor * 1000:9.1f} ms")
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de agents/timecode.py frente a timedelta.")
+    parser.add_argument("--cues", type=int, default=100_000)
+    parser.add_argument("--partes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "bench.srt")
+        generar_srt(ruta, args.cues)
+        pares = leer_tiempos(ruta)
+    textos = [t for par in pares for t in par]
+    print(f"{args.cues} cues ({len(textos)} timestamps), división en {args.partes} partes\n")
+
+    print("Parseo:")
+    t_old, tds = medir("anterior (_parse_time, timedelta)", lambda: [_parse_time(t) for t in textos])
+    t_new, mss = medir("timecode.parse_ms", lambda: [parse_ms(t) for t in textos])
+    print(f"  {'speedup':<38} {t_old / t_new:9.1f}x\n")
+
+    print("Formateo:")
+    t_old, _ = medir("anterior (_format_time)", lambda: [_format_time(td) for td in tds])
+    t_new, _ = medir("timecode.format_ms", lambda: [format_ms(ms) for ms in mss])
+    print(f"  {'speedup':<38} {t_old / t_new:9.1f}x\n")
+
+    print("División de cues:")
+    pares_td = list(zip(tds[::2], tds[1::2]))
+    pares_ms = list(zip(mss[::2], mss[1::2]))
+    t_old, div_old = medir("anterior (timedelta / n acumulado)",
+                           lambda: [_dividir_legacy(a, b, args.partes) for a, b in pares_td])
+    t_new, div_new = medir("timecode.dividir_intervalo",
+                           lambda: [dividir_intervalo(a, b, args.partes) for a, b in pares_ms])
+    print(f"  {'speedup':<38} {t_old / t_new:9.1f}x\n")
+
+    # Deriva: cuánto se aleja el último límite del fin real del cue
+    deriva_old = max(abs((lim[-1] - fin) / timedelta(microseconds=1)) for lim, (_, fin) in zip(div_old, pares_td))
+    deriva_new = max(abs(lim[-1] - fin) for lim, (_, fin) in zip(div_new, pares_ms))
+    print("Deriva máxima del último límite:")
+    print(f"  {'anterior':<38} {deriva_old:9.0f} µs")
+    print(f"  {'timecode':<38} {deriva_new * 1000:9.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
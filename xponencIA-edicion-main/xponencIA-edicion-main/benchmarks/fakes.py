@@ -0,0 +1,368 @@
+# benchmarks/fakes.py = Reemplazos locales de Gemini, Resolve y Whisper para los benchmarks
+#
+# Módulos falsos que se instalan en sys.modules antes de importar el orquestador:
+# - google.generativeai: subida, PROCESSING, generación (con o sin streaming) y borrado,
+#   cada uno con una latencia configurable; las respuestas tienen el formato real del plan.
+# - DaVinciResolveScript: proyecto/timeline en memoria que registra cada llamada.
+# - whisper (opcional): transcribe a un factor de tiempo real fijo, sin modelo ni GPU.
+
+import os
+import re
+import sys
+import json
+import time
+import types
+import random
+import threading
+import itertools
+
+
+class Latencias:
+    """Latencias simuladas en segundos. `jitter` es la variación relativa (0.2 = ±20 %)."""
+
+    def __init__(self, subida_s=0.5, subida_mb_s=50.0, processing_s=2.0, generacion_s=3.0,
+                 generacion_por_bloque_s=0.02, resolve_llamada_s=0.002, jitter=0.2, seed=0):
+        self.subida_s = subida_s
+        self.subida_mb_s = subida_mb_s
+        self.processing_s = processing_s
+        self.generacion_s = generacion_s
+        self.generacion_por_bloque_s = generacion_por_bloque_s
+        self.resolve_llamada_s = resolve_llamada_s
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def esperar(self, segundos: float):
+        if segundos <= 0:
+            return
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(segundos * factor)
+
+    def como_dict(self) -> dict:
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+
+# ==============================================================================
+# GEMINI (google.generativeai)
+# ==============================================================================
+
+_BLOQUE_S = 7.0
+
+
+def _bloques(inicio: float, fin: float) -> list[dict]:
+    bloques = []
+    t = inicio
+    while t < fin:
+        bloques.append({"start": round(t, 2), "end": round(min(t + _BLOQUE_S, fin), 2),
+                        "analisis": "Análisis simulado del bloque."})
+        t += _BLOQUE_S
+    return bloques
+
+
+def _respuesta_para(prompt: str) -> dict:
+    # Se responde según la plantilla del estratega que se reconozca en el prompt
+    if '"meta_analisis_final"' in prompt and "ANÁLISIS POR BLOQUES" in prompt:
+        return {"meta_analisis_final": "Meta-análisis simulado."}
+    ventana = re.search(r'"window":\s*\[\s*([\d.]+),\s*([\d.]+)\s*\]', prompt)
+    if ventana:
+        return {"segments": _bloques(float(ventana.group(1)), float(ventana.group(2)))}
+    duracion = re.search(r'"duration":\s*([\d.]+)', prompt)
+    return {"segments": _bloques(0.0, float(duracion.group(1)) if duracion else 60.0),
+            "meta_analisis_final": "Meta-análisis simulado."}
+
+
+class _Estado:
+    def __init__(self, nombre):
+        self.name = nombre
+
+
+class _Archivo:
+    def __init__(self, name, display_name, listo_en):
+        self.name = name
+        self.display_name = display_name
+        self._listo_en = listo_en
+
+    @property
+    def state(self):
+        return _Estado("ACTIVE" if time.monotonic() >= self._listo_en else "PROCESSING")
+
+
+class _Respuesta:
+    def __init__(self, text):
+        self.text = text
+
+
+class GenaiFalso:
+    """Estado compartido del módulo google.generativeai falso."""
+
+    def __init__(self, latencias: Latencias):
+        self.latencias = latencias
+        self.archivos = {}
+        self.llamadas = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _registrar(self, nombre):
+        with self._lock:
+            self.llamadas[nombre] = self.llamadas.get(nombre, 0) + 1
+
+    def modulo(self) -> types.ModuleType:
+        genai = types.ModuleType("google.generativeai")
+        falso = self
+
+        def configure(api_key=None, **_):
+            falso._registrar("configure")
+
+        def upload_file(path, display_name=None, **_):
+            import os
+            falso._registrar("upload_file")
+            mb = os.path.getsize(path) / 2**20
+            falso.latencias.esperar(falso.latencias.subida_s + mb / falso.latencias.subida_mb_s)
+            archivo = _Archivo(f"files/falso-{next(falso._ids)}", display_name or os.path.basename(path),
+                               time.monotonic() + falso.latencias.processing_s)
+            with falso._lock:
+                falso.archivos[archivo.name] = archivo
+            return archivo
+
+        def get_file(name, **_):
+            falso._registrar("get_file")
+            return falso.archivos[name]
+
+        def delete_file(name, **_):
+            falso._registrar("delete_file")
+            with falso._lock:
+                falso.archivos.pop(getattr(name, "name", name), None)
+
+        def list_files(**_):
+            falso._registrar("list_files")
+            with falso._lock:
+                return list(falso.archivos.values())
+
+        class GenerationConfig:
+            def __init__(self, **kwargs):
+                self.kwargs = kwargs
+
+        class GenerativeModel:
+            def __init__(self, model_name, **_):
+                self.model_name = model_name
+
+            def generate_content(self, contents, generation_config=None, stream=False, **_):
+                falso._registrar("generate_content")
+                prompt = next((c for c in contents if isinstance(c, str)), "")
+                texto = json.dumps(_respuesta_para(prompt), ensure_ascii=False)
+                bloques = texto.count('"analisis"')
+                falso.latencias.esperar(falso.latencias.generacion_s)
+                if not stream:
+                    falso.latencias.esperar(bloques * falso.latencias.generacion_por_bloque_s)
+                    return _Respuesta(texto)
+                return self._stream(texto, bloques)
+
+            def _stream(self, texto, bloques):
+                # Trozos de ~200 caracteres, como llegan los chunks del SDK
+                pausa = bloques * falso.latencias.generacion_por_bloque_s / max(1, len(texto) // 200)
+                for i in range(0, len(texto), 200):
+                    time.sleep(pausa)
+                    yield _Respuesta(texto[i:i + 200])
+
+        genai.configure = configure
+        genai.upload_file = upload_file
+        genai.get_file = get_file
+        genai.delete_file = delete_file
+        genai.list_files = list_files
+        genai.GenerativeModel = GenerativeModel
+        genai.types = types.SimpleNamespace(GenerationConfig=GenerationConfig)
+        return genai
+
+
+# ==============================================================================
+# DAVINCI RESOLVE (DaVinciResolveScript)
+# ==============================================================================
+
+class ResolveFalso:
+    """Proyecto y timelines en memoria; guarda cada llamada a la API en `llamadas`.
+
+    `marcadores` y `cortes` van por nombre de timeline. El proyecto arranca con una
+    timeline activa ("Timeline 1"); las demás se crean desde el media pool.
+    """
+
+    def __init__(self, latencias: Latencias, fps: str = "25"):
+        self.latencias = latencias
+        self.fps = fps
+        self.llamadas = []
+        self.marcadores = {}
+        self.cortes = {}
+        self._lock = threading.Lock()
+
+    def _llamar(self, nombre, *args):
+        with self._lock:
+            self.llamadas.append((nombre, args))
+        self.latencias.esperar(self.latencias.resolve_llamada_s)
+
+    def modulo(self) -> types.ModuleType:
+        falso = self
+        dvr = types.ModuleType("DaVinciResolveScript")
+
+        class Timeline:
+            def __init__(self, nombre):
+                self.nombre = nombre
+                falso.marcadores[nombre] = {}
+                falso.cortes[nombre] = []
+
+            def GetName(self):
+                falso._llamar("Timeline.GetName")
+                return self.nombre
+
+            def GetSetting(self, clave):
+                falso._llamar("Timeline.GetSetting", clave)
+                return falso.fps if clave == "timelineFrameRate" else None
+
+            def GetMarkers(self):
+                falso._llamar("Timeline.GetMarkers")
+                return dict(falso.marcadores[self.nombre])
+
+            def AddMarker(self, frame, color, nombre, nota, duracion):
+                falso._llamar("Timeline.AddMarker", frame, color, nombre)
+                marcadores = falso.marcadores[self.nombre]
+                if frame in marcadores:
+                    return False
+                marcadores[frame] = {"color": color, "name": nombre, "note": nota, "duration": duracion}
+                return True
+
+            def DeleteMarkerAtFrame(self, frame):
+                falso._llamar("Timeline.DeleteMarkerAtFrame", frame)
+                return falso.marcadores[self.nombre].pop(frame, None) is not None
+
+            def Cut(self, frame):
+                falso._llamar("Timeline.Cut", frame)
+                falso.cortes[self.nombre].append(frame)
+                return True
+
+        class MediaPool:
+            def __init__(self, proyecto):
+                self.proyecto = proyecto
+
+            def ImportMedia(self, rutas):
+                falso._llamar("MediaPool.ImportMedia", tuple(rutas))
+                return [os.path.basename(ruta) for ruta in rutas]
+
+            def CreateTimelineFromClips(self, nombre, clips):
+                falso._llamar("MediaPool.CreateTimelineFromClips", nombre)
+                if any(t.nombre == nombre for t in self.proyecto.timelines):
+                    return None
+                timeline = Timeline(nombre)
+                self.proyecto.timelines.append(timeline)
+                self.proyecto.timeline = timeline
+                return timeline
+
+        class Proyecto:
+            def __init__(self):
+                self.timeline = Timeline("Timeline 1")
+                self.timelines = [self.timeline]
+
+            def GetCurrentTimeline(self):
+                falso._llamar("Project.GetCurrentTimeline")
+                return self.timeline
+
+            def GetTimelineCount(self):
+                falso._llamar("Project.GetTimelineCount")
+                return len(self.timelines)
+
+            def GetTimelineByIndex(self, indice):
+                falso._llamar("Project.GetTimelineByIndex", indice)
+                return self.timelines[indice - 1] if 1 <= indice <= len(self.timelines) else None
+
+            def SetCurrentTimeline(self, timeline):
+                falso._llamar("Project.SetCurrentTimeline", timeline.nombre)
+                self.timeline = timeline
+                return True
+
+            def GetMediaPool(self):
+                falso._llamar("Project.GetMediaPool")
+                return MediaPool(self)
+
+            def GetSetting(self, clave):
+                falso._llamar("Project.GetSetting", clave)
+                return falso.fps if clave == "timelineFrameRate" else None
+
+        class ProjectManager:
+            def __init__(self):
+                self.proyecto = Proyecto()
+
+            def GetCurrentProject(self):
+                falso._llamar("ProjectManager.GetCurrentProject")
+                return self.proyecto
+
+        class Resolve:
+            def __init__(self):
+                self.manager = ProjectManager()
+
+            def GetProjectManager(self):
+                falso._llamar("Resolve.GetProjectManager")
+                return self.manager
+
+        instancia = Resolve()
+
+        def scriptapp(nombre):
+            falso._llamar("scriptapp", nombre)
+            return instancia if nombre == "Resolve" else None
+
+        dvr.scriptapp = scriptapp
+        return dvr
+
+
+# ==============================================================================
+# WHISPER (opcional)
+# ==============================================================================
+
+def modulo_whisper_falso(rtf: float = 0.05, segmento_s: float = 4.0, sample_rate: int = 16000) -> types.ModuleType:
+    """whisper.load_model() que devuelve un modelo que tarda `rtf` * duración del audio."""
+    whisper = types.ModuleType("whisper")
+
+    class Modelo:
+        def transcribe(self, audio, language=None, fp16=False, word_timestamps=False, **_):
+            duracion = len(audio) / sample_rate if not isinstance(audio, str) else 60.0
+            time.sleep(duracion * rtf)
+            segments, t = [], 0.0
+            while t < duracion:
+                fin = min(t + segmento_s, duracion)
+                texto = " esto es un segmento de prueba"
+                segmento = {"id": len(segments), "start": t, "end": fin, "text": texto}
+                if word_timestamps:
+                    palabras = texto.split()
+                    paso = (fin - t) / len(palabras)
+                    segmento["words"] = [
+                        {"word": f" {p}", "start": t + i * paso, "end": t + (i + 1) * paso, "probability": 1.0}
+                        for i, p in enumerate(palabras)
+                    ]
+                segments.append(segmento)
+                t = fin
+            return {"text": "".join(s["text"] for s in segments), "segments": segments}
+
+    def load_model(nombre, device=None, **_):
+        return Modelo()
+
+    whisper.load_model = load_model
+    return whisper
+
+
+def instalar(latencias: Latencias, whisper_rtf: float | None = None) -> dict:
+    """Instala los módulos falsos en sys.modules y devuelve sus estados para inspección."""
+    genai = GenaiFalso(latencias)
+    resolve = ResolveFalso(latencias)
+
+    modulo_genai = genai.modulo()
+    google = sys.modules.get("google") or types.ModuleType("google")
+    google.generativeai = modulo_genai
+    sys.modules["google"] = google
+    sys.modules["google.generativeai"] = modulo_genai
+    sys.modules["DaVinciResolveScript"] = resolve.modulo()
+
+    if whisper_rtf is not None:
+        sys.modules["whisper"] = modulo_whisper_falso(whisper_rtf)
+        try:
+            import torch  # noqa: F401
+        except ImportError:
+            # Solo para que el transcriptor resuelva el dispositivo: siempre CPU
+            sys.modules["torch"] = types.SimpleNamespace(cuda=types.SimpleNamespace(is_available=lambda: False))
+    return {"genai": genai, "resolve": resolve}
@@ -0,0 +1,40 @@
+# benchmarks/fixtures.py = Archivos sintéticos de audio y video para los benchmarks
+#
+# Genera con FFmpeg clips de la duración pedida: un tono con pausas regulares (4 s de
+# "voz", 2 s de silencio, así el VAD y el corte por ventanas tienen silencios reales)
+# y, para video, un patrón de prueba en movimiento. Se guardan en benchmarks/fixtures/
+# y se reutilizan entre corridas.
+
+import os
+import subprocess
+
+DIR_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Tono de 4 s y silencio de 2 s, en bucle. La duración va en la fuente (sine), no en el volume
+_AUDIO = "sine=frequency=220:sample_rate=48000:duration={duracion},volume='if(lt(mod(t,6),4),0.5,0)':eval=frame"
+
+
+def _ffmpeg_cmd(ruta: str, duracion_s: float, video: bool) -> list[str]:
+    cmd = ["ffmpeg", "-nostdin", "-y", "-v", "error", "-f", "lavfi", "-i", _AUDIO.format(duracion=duracion_s)]
+    if video:
+        cmd += ["-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=25:duration={duracion_s}",
+                "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p"]
+    cmd += ["-c:a", "aac" if video else "pcm_s16le", "-t", str(duracion_s), ruta]
+    return cmd
+
+
+def fixture(duracion_s: float, tipo: str = "video", directorio: str = DIR_FIXTURES) -> str:
+    """Devuelve la ruta de un clip sintético de `duracion_s` segundos, generándolo si no existe."""
+    os.makedirs(directorio, exist_ok=True)
+    ext = ".mp4" if tipo == "video" else ".wav"
+    ruta = os.path.join(directorio, f"sintetico_{tipo}_{duracion_s:g}s{ext}")
+    if os.path.exists(ruta):
+        return ruta
+
+    print(f"Generando fixture {os.path.basename(ruta)}...")
+    tmp = f"{ruta}.tmp{ext}"
+    proc = subprocess.run(_ffmpeg_cmd(tmp, duracion_s, tipo == "video"), capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"FFmpeg no pudo generar el fixture: {proc.stderr.decode(errors='ignore')[-500:]}")
+    os.replace(tmp, ruta)
+    return ruta
@@ -0,0 +1,85 @@
+# config.py = Configuración central del proyecto
+
+#--------------------------------------
+# Objetivos:
+# - Un solo lugar para rutas, extensiones soportadas y parámetros compartidos.
+# - Leer el .env y configurar Gemini una sola vez, recién cuando una etapa lo necesita.
+# - Leer config.json (estilos de subtítulos) desde la raíz del proyecto y no desde el CWD.
+
+import os
+import json
+import threading
+
+# --- RUTAS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_DIR = os.path.join(BASE_DIR, "input")
+WORKSPACE_DIR = os.path.join(BASE_DIR, "workspace")
+CLIPS_DIR = os.path.join(WORKSPACE_DIR, "clips")
+REPORTS_DIR = os.path.join(WORKSPACE_DIR, "reports")
+CACHE_DIR = os.path.join(WORKSPACE_DIR, "cache")
+CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
+
+# --- FORMATOS DE ENTRADA ---
+VIDEO_EXTS = [".mp4", ".mov", ".avi", ".mkv"]
+AUDIO_EXTS = [".wav", ".mp3"]
+
+# --- TRANSCRIPCIÓN ---
+MODEL_SIZE = "large-v3"
+LANGUAGE = "es"
+
+# --- SUBTÍTULOS (valores por defecto si no hay config.json) ---
+CONFIG_DEFAULT = {
+    "subtitle_style": {"font": "Arial", "size": 50, "color": "white", "position": "bottom"},
+    "max_characters_per_line": 40
+}
+
+_lock = threading.Lock()
+_entorno_cargado = False
+_genai = None
+_config = None
+
+
+def cargar_entorno() -> None:
+    """Carga el .env de la raíz del proyecto (una sola vez por proceso)."""
+    global _entorno_cargado
+    with _lock:
+        if _entorno_cargado:
+            return
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(BASE_DIR, ".env"))
+        _entorno_cargado = True
+
+
+def configurar_gemini():
+    """Devuelve el módulo google.generativeai ya configurado con la API key.
+
+    La importación del SDK y la lectura de la clave ocurren con la primera llamada,
+    no al importar los agentes: las etapas que no usan Gemini no pagan ese costo.
+    """
+    global _genai
+    if _genai is not None:
+        return _genai
+    cargar_entorno()
+    with _lock:
+        if _genai is None:
+            import google.generativeai as genai
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("No se encontró la API Key de Gemini.")
+            genai.configure(api_key=api_key)
+            _genai = genai
+    return _genai
+
+
+def config_subtitulos() -> dict:
+    """Configuración de subtítulos: config.json de la raíz o los valores por defecto."""
+    global _config
+    with _lock:
+        if _config is None:
+            if os.path.exists(CONFIG_PATH):
+                with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+                    _config = {**CONFIG_DEFAULT, **json.load(f)}
+            else:
+                _config = CONFIG_DEFAULT
+                print("⚠️ No se encontró config.json, usando configuración por defecto.")
+    return _config
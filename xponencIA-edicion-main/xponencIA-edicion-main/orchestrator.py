@@ -1,28 +1,41 @@
 # orchestrator.py (Versión Final del MVP)
 import os
+import sys
 import time
 import json
-from moviepy.editor import VideoFileClip
-#from moviepy import VideoFileClip
-import google.generativeai as genai
-from dotenv import load_dotenv
-
-# Agentes
-from agents.transcriber import transcribe_clip_detailed
-from agents.strategist import get_edit_plan_from_gemini
+import queue
+import asyncio
+import argparse
+import threading
+import traceback
+import contextvars
+from datetime import datetime
+
+from config import (
+    INPUT_DIR, REPORTS_DIR, CACHE_DIR, MODEL_SIZE, LANGUAGE, configurar_gemini
+)
+
+# Agentes livianos. Los pesados (Whisper, numpy, el SDK de Gemini, Resolve) se
+# importan dentro de la etapa que los usa, así cada subcomando carga solo lo suyo.
+from agents.backends import BACKENDS, DEFAULT_BACKEND, BEAM_SIZE, BATCH_SIZE, CPU_THREADS
+from agents.strategist import MODEL_NAME, PROMPT_TEMPLATE_VANTA, PROMPT_TEMPLATE_VENTANA, PROMPT_TEMPLATE_META, WINDOW_S
+from agents.cache import CacheResultados, huella_archivo, clave_cache, hash_texto
+from agents.gemini_async import GeminiAsyncClient, MAX_CONCURRENCY, REQUESTS_PER_MINUTE
+from agents.proxy import build_proxy
+from agents.compilador import exportar_plan, FORMATOS, FPS_DEFAULT
+from agents.metricas import METRICAS, span
+from agents.manifiesto import Manifiesto, recolectar_subidas, COMPLETADO, PARCIAL, ERROR, SUBIDO, BORRADO
+from agents.strategist import ErrorAnalisis
 
 # --- CONFIGURACIÓN ---
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("No se encontró la API Key de Gemini.")
-genai.configure(api_key=GEMINI_API_KEY)
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-INPUT_DIR = os.path.join(BASE_DIR, "input")
-WORKSPACE_DIR = os.path.join(BASE_DIR, "workspace")
-CLIPS_DIR = os.path.join(WORKSPACE_DIR, "clips")
-REPORTS_DIR = os.path.join(WORKSPACE_DIR, "reports")
+# Tamaño de las colas entre etapas: limita cuántos archivos transcritos esperan a Gemini
+QUEUE_SIZE = 2
+
+# Formatos de subtítulos que se pueden generar directo desde la transcripción
+SUBTITLE_FORMATS = ("srt", "vtt")
+
+# Marca de fin de trabajos en las colas
+_FIN = None
 
 # --- FUNCIONES AUXILIARES ---
 
@@ -35,124 +48,696 @@ def simplify_transcription_report(transcription_data: dict) -> dict:
             "end": segment.get("end"),
             "text": segment.get("text", "").strip()
         })
-    
+
     clean_report = {
         "duration": transcription_data.get("clip_duration"),
         "dialogues": simplified_dialogues
     }
     return clean_report
 
-# --- Bloque principal ---
-if __name__ == '__main__':
-
-    # Buscar el único archivo en input/
-    input_files = [f for f in os.listdir(INPUT_DIR) if os.path.isfile(os.path.join(INPUT_DIR, f))]
-    
-    if len(input_files) == 0:
-        print(f"¡ERROR! No se encontró ningún archivo en {INPUT_DIR}")
-        exit()
-    elif len(input_files) > 1:
-        print(f"¡ERROR! Hay más de un archivo en {INPUT_DIR}. Deja solo uno.")
-        exit()
-
-
-    input_filename = input_files[0]
 
-    # Convertir a ruta absoluta y reemplazar \ por / para compatibilidad con FFmpeg
-    source_path = os.path.abspath(os.path.join(INPUT_DIR, input_filename))
-    source_path = source_path.replace("\\", "/")
-
-    print("Archivo a procesar:", source_path)
-    print("Existe?", os.path.exists(source_path))
-
-    #modificación hehca por Orne L.
-    # Esto convierte la ruta relativa en ruta absoluta, que FFmpeg entiende sin problemas.
-    # y no hay problema para que lo encuentre.
+def list_input_files(input_dir: str) -> list[str]:
+    """Devuelve las rutas absolutas de todos los archivos de input/, en orden alfabético."""
+    input_files = sorted(f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f)))
+    # Ruta absoluta con / para compatibilidad con FFmpeg
+    return [os.path.abspath(os.path.join(input_dir, f)).replace("\\", "/") for f in input_files]
+
+
+def read_job_queue(queue_path: str) -> list[str]:
+    """Lee un archivo de cola de trabajos: una ruta por línea, # para comentarios."""
+    with open(queue_path, "r", encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [os.path.abspath(line).replace("\\", "/") for line in lines if line and not line.startswith("#")]
+
+
+# --- ETAPAS DEL PIPELINE ---
+
+class _TranscriptionStage:
+    # El pool (y por lo tanto el modelo) solo se crea si algún archivo no está en caché
+    def __init__(self, subtitle_format: str | None = None, backend: str = DEFAULT_BACKEND,
+                 backend_options: dict | None = None, solo_voz: bool = False, chunked: bool = False,
+                 word_index: bool = False):
+        self._pool = None
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.solo_voz = solo_voz
+        self.chunked = chunked
+        # Los subtítulos se arman con los tiempos por palabra de Whisper
+        self.subtitle_format = subtitle_format
+        # El índice de palabras (*_transcription.idx) lo consulta el subcomando `search`
+        self.word_index = word_index
+
+    def run(self, source_path: str, cache: CacheResultados) -> dict:
+        input_filename = os.path.basename(source_path)
+        base_name = os.path.splitext(input_filename)[0]
+        huella = huella_archivo(source_path)
+
+        # El manifiesto dice qué etapas ya se completaron en una corrida anterior
+        manifiesto = Manifiesto.cargar(REPORTS_DIR, source_path, huella)
+        reanudar_desde = manifiesto.primera_incompleta()
+        if reanudar_desde != "transcripcion":
+            print(f"--- [Orquestador] {input_filename}: se reanuda desde la etapa '{reanudar_desde or 'final'}'. ---")
+
+        # 1. Transcripción Global
+        word_timestamps = self.subtitle_format is not None or self.word_index
+        clave_transcripcion = clave_cache("transcripcion", huella, model=MODEL_SIZE, language=LANGUAGE,
+                                          words=word_timestamps, voz=self.solo_voz, ventanas=self.chunked,
+                                          backend=self.backend,
+                                          **self.backend_options)
+        transcription_path = os.path.join(REPORTS_DIR, f"{base_name}_transcription.json")
+        full_transcription_data = None
+        if manifiesto.completada("transcripcion", clave_transcripcion):
+            with open(transcription_path, 'r', encoding='utf-8') as f:
+                full_transcription_data = json.load(f)
+            print(f"--- [Orquestador] Transcripción de {input_filename} recuperada del manifiesto. ---")
+        else:
+            full_transcription_data = cache.get(clave_transcripcion)
+            if full_transcription_data is not None:
+                print(f"--- [Orquestador] Transcripción de {input_filename} recuperada de la caché. ---")
+                os.makedirs(REPORTS_DIR, exist_ok=True)
+                with open(transcription_path, 'w', encoding='utf-8') as f:
+                    json.dump(full_transcription_data, f, ensure_ascii=False, indent=4)
+            else:
+                print(f"--- [Orquestador] Iniciando transcripción de {input_filename}... ---")
+                if self._pool is None:
+                    from agents.transcriber import TranscriptionPool
+                    self._pool = TranscriptionPool(word_timestamps=word_timestamps, word_index=self.word_index,
+                                                   backend=self.backend, backend_options=self.backend_options,
+                                                   solo_voz=self.solo_voz, chunked=self.chunked)
+                transcription_path = self._pool.submit(source_path, REPORTS_DIR).result()
+                with open(transcription_path, 'r', encoding='utf-8') as f:
+                    full_transcription_data = json.load(f)
+                cache.put(clave_transcripcion, full_transcription_data)
+            manifiesto.marcar("transcripcion", COMPLETADO, artefacto=transcription_path, clave=clave_transcripcion)
+
+        if self.word_index:
+            from agents.indice_palabras import indexar_transcripcion, ruta_indice
+            # Una transcripción recuperada (caché o manifiesto) puede no tener su índice al lado
+            if not os.path.exists(ruta_indice(transcription_path)):
+                indexar_transcripcion(full_transcription_data.get("dialogue_segments", []), transcription_path)
+
+        # Subtítulos directo desde los segmentos en memoria, sin escribir y releer un SRT intermedio
+        subtitle_path = None
+        if self.subtitle_format:
+            from agents.subtitulos import generar_subtitulos
+            subtitle_path = os.path.join(REPORTS_DIR, f"{base_name}.{self.subtitle_format}")
+            generar_subtitulos(full_transcription_data.get("dialogue_segments", []), subtitle_path)
+
+        # 2. Limpieza y Preparación del Dossier/Reporte
+        clave_dossier = clave_cache("dossier", huella, transcripcion=clave_transcripcion, input_name=input_filename)
+        report_path = os.path.join(REPORTS_DIR, f"{base_name}_dossier_limpio.json")
+        if manifiesto.completada("dossier", clave_dossier):
+            with open(report_path, 'r', encoding='utf-8') as f:
+                clean_report = json.load(f)
+        else:
+            clean_report = cache.get(clave_dossier)
+            if clean_report is None:
+                print("--- [Orquestador] Limpiando el reporte de transcripción... ---")
+                clean_report = simplify_transcription_report(full_transcription_data)
+                clean_report["input_name"] = input_filename
+                cache.put(clave_dossier, clean_report)
+
+            # Guardar el reporte limpio para depuración
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(clean_report, f, ensure_ascii=False, indent=4)
+            print(f"Dossier limpio para Gemini guardado en: {report_path}")
+            manifiesto.marcar("dossier", COMPLETADO, artefacto=report_path, clave=clave_dossier)
+
+        return {
+            "source_path": source_path,
+            "input_filename": input_filename,
+            "base_name": base_name,
+            "huella": huella,
+            "clean_report": clean_report,
+            "subtitulos": subtitle_path,
+            "manifiesto": manifiesto,
+            "mapa_voz": full_transcription_data.get("mapa_voz"),
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+def _prompt_hash(windowed: bool) -> str:
+    # El modo por ventanas usa otras plantillas y un tamaño de ventana: su plan se cachea aparte
+    if windowed:
+        return hash_texto(f"{PROMPT_TEMPLATE_VENTANA}{PROMPT_TEMPLATE_META}{WINDOW_S}")
+    return hash_texto(PROMPT_TEMPLATE_VANTA)
+
+
+async def analysis_stage(job: dict, cache: CacheResultados, client: GeminiAsyncClient) -> str:
+    """Sube el archivo a Gemini, pide el plan y lo guarda. Devuelve la ruta del plan."""
+    input_filename = job["input_filename"]
+    clean_report = job["clean_report"]
+
+    # Con mapa de voz Gemini recibe el proxy condensado, y el dossier tiene que hablar
+    # en los mismos tiempos; el plan se devuelve al tiempo del archivo original
+    mapa = None
+    if job.get("mapa_voz"):
+        from agents.vad import MapaVoz
+        mapa = MapaVoz.desde_dict(job["mapa_voz"])
+        clean_report = {**clean_report, "duration": mapa.duracion_condensada,
+                        "dialogues": mapa.remapear(clean_report.get("dialogues", []), a_fuente=False)}
 
+    # 3. Análisis y subida del archivo a Gemini (sea audio o video)
+    clave_plan = clave_cache(
+        "plan", job["huella"],
+        dossier=hash_texto(json.dumps(clean_report, sort_keys=True, ensure_ascii=False)),
+        model=MODEL_NAME, prompt=_prompt_hash(client.windowed), voz=mapa is not None
+    )
+    manifiesto = job["manifiesto"]
+    plan_path = os.path.join(REPORTS_DIR, f"{job['base_name']}_edit_plan.json")
+    if manifiesto.completada("plan", clave_plan):
+        print(f"--- [Orquestador] Plan de {input_filename} ya completo según el manifiesto. Se omite Gemini. ---")
+        return plan_path
+
+    final_edit_plan = cache.get(clave_plan)
+    estado_plan = COMPLETADO
+
+    if final_edit_plan is not None:
+        print(f"--- [Orquestador] Plan de {input_filename} recuperado de la caché. Se omite Gemini. ---")
+    else:
+        # Se sube un proxy liviano (o solo audio) en lugar del máster completo
+        proxy_path = await asyncio.to_thread(build_proxy, job["source_path"], REPORTS_DIR, job["huella"],
+                                             mapa.tramos if mapa else None)
+
+        # Cada bloque se agrega al .jsonl apenas Gemini lo termina de generar:
+        # un corte a mitad de la respuesta no pierde lo ya recibido
+        blocks_path = os.path.join(REPORTS_DIR, f"{job['base_name']}_edit_plan.jsonl")
+        if manifiesto.etapa("analisis")["estado"] != COMPLETADO and os.path.exists(blocks_path) \
+                and os.path.getsize(blocks_path) > 0:
+            # Los bloques de un intento que no terminó no se pisan: se guardan con la fecha de ese intento
+            marca = datetime.fromtimestamp(os.path.getmtime(blocks_path)).strftime("%Y%m%d_%H%M%S")
+            anterior = blocks_path.replace(".jsonl", f"_{marca}.jsonl")
+            os.replace(blocks_path, anterior)
+            print(f"--- [Orquestador] Bloques del intento anterior de {input_filename} guardados en: {anterior} ---")
+        ventanas_previas = manifiesto.ventanas(clave_plan) if client.windowed else None
+        if ventanas_previas:
+            print(f"--- [Orquestador] {input_filename}: {len(ventanas_previas)} ventanas ya analizadas en una corrida anterior. ---")
+        with open(blocks_path, 'w', encoding='utf-8') as blocks_file:
+            write_lock = threading.Lock()
+
+            def on_block(block: dict):
+                if mapa:
+                    block = mapa.remapear([block])[0]
+                with write_lock:
+                    blocks_file.write(json.dumps(block, ensure_ascii=False) + "\n")
+                    blocks_file.flush()
+
+            # El id de cada subida queda en el manifiesto hasta que se borra del servidor
+            def on_upload(archivo):
+                manifiesto.marcar("subida", SUBIDO, archivo_id=archivo.name)
+
+            def on_delete(archivo):
+                manifiesto.marcar("subida", BORRADO, archivo_id=archivo.name)
+
+            def on_window(inicio: float, fin: float, bloques: list[dict]):
+                manifiesto.guardar_ventana(clave_plan, inicio, fin, bloques)
+
+            # Subida, espera con backoff, análisis y borrado del archivo en el servidor
+            try:
+                clip_analysis = await client.process(
+                    proxy_path, input_filename, clean_report, on_block=on_block,
+                    on_upload=on_upload, on_delete=on_delete,
+                    ventanas_previas=ventanas_previas, on_window=on_window,
+                )
+            except ErrorAnalisis as e:
+                # Sin plan no hay nada que guardar: la próxima corrida reintenta desde acá
+                manifiesto.marcar("analisis", ERROR, error=str(e), bloques_recibidos=len(e.bloques),
+                                  bloques_jsonl=blocks_path)
+                raise
+        if mapa:
+            clip_analysis["segments"] = mapa.remapear(clip_analysis.get("segments", []))
+        final_edit_plan = {"plan_de_edicion": [clip_analysis]}
+
+        # Un plan parcial (ventanas fallidas) se guarda, pero no en caché ni como completo
+        if clip_analysis.get("ventanas_fallidas"):
+            estado_plan = PARCIAL
+        else:
+            cache.put(clave_plan, final_edit_plan)
+        manifiesto.marcar("analisis", estado_plan, bloques=len(clip_analysis.get("segments", [])))
 
-    # 1. Transcripción Global
-    print("--- [Orquestador] Iniciando transcripción del video completo... ---")
-    full_transcription_report_path = transcribe_clip_detailed(source_path, REPORTS_DIR)
-    with open(full_transcription_report_path, 'r', encoding='utf-8') as f:
-        full_transcription_data = json.load(f)
+    # 4. Guardar el Plan de Edición Final
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        json.dump(final_edit_plan, f, ensure_ascii=False, indent=4)
+    # La exportación y Resolve se atan al contenido del plan y no solo a su clave: el plan
+    # completo que sale al reanudar uno parcial tiene la misma clave pero otros segmentos
+    contenido = hash_texto(json.dumps(final_edit_plan, sort_keys=True, ensure_ascii=False))
+    if manifiesto.etapa("plan").get("contenido") != contenido:
+        manifiesto.invalidar_desde("plan")
+    manifiesto.marcar("plan", estado_plan, artefacto=plan_path, clave=clave_plan, contenido=contenido)
+    print(f"El plan de edición multimodal ha sido guardado en: {plan_path}")
+    return plan_path
+
+
+def nombre_timeline(path: str) -> str:
+    """Nombre de la timeline de Resolve de un archivo o de su plan: el del archivo sin extensión."""
+    base = os.path.basename(path)
+    if base.endswith("_edit_plan.json"):
+        return base[:-len("_edit_plan.json")]
+    return os.path.splitext(base)[0]
+
+
+def resolve_stage(plan_path: str, sesion, timeline: str | None = None, media: str | None = None,
+                  exigir: bool = False) -> tuple[int, int]:
+    """Lee el plan de edición y crea marcadores y cortes en DaVinci Resolve.
+
+    Con `timeline` se aplica en la timeline de ese nombre (ver SesionResolve.usar_timeline).
+    Devuelve (segmentos, marcadores omitidos porque el frame ya tenía otro marcador).
+    """
+    with open(plan_path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    if timeline is not None:
+        sesion.usar_timeline(timeline, media=media, exigir=exigir)
+    omitidos_antes = sesion.omitidos
+
+    # Suponiendo que el plan tiene segmentos con "start" y "end"
+    segments = plan["plan_de_edicion"][0].get("segments", []) if plan["plan_de_edicion"] else []
+
+    if segments:
+        print("--- [Orquestador] Creando marcadores en Resolve ---")
+        sesion.agregar_marcadores(
+            [{"time": s["start"], "label": f"Inicio {i+1}"} for i, s in enumerate(segments)]
+            + [{"time": s["end"], "label": f"Fin {i+1}"} for i, s in enumerate(segments)]
+        )
+
+        print("--- [Orquestador] Haciendo cortes en Resolve ---")
+        sesion.hacer_cortes(segments)
+    return len(segments), sesion.omitidos - omitidos_antes
+
+
+# --- PIPELINE POR LOTES ---
+
+def run_batch(source_paths: list[str], apply_resolve: bool = True, queue_size: int = QUEUE_SIZE,
+              max_concurrency: int = MAX_CONCURRENCY, requests_per_minute: int = REQUESTS_PER_MINUTE,
+              windowed: bool = False, export_format: str | None = None, fps: float = FPS_DEFAULT,
+              subtitle_format: str | None = None, backend: str = DEFAULT_BACKEND,
+              backend_options: dict | None = None, solo_voz: bool = False, chunked: bool = False,
+              word_index: bool = False) -> dict:
+    """Procesa varios archivos en tres etapas encadenadas por colas acotadas.
+
+    Transcripción (GPU/CPU), análisis en Gemini (red) y aplicación en Resolve corren
+    en hilos separados, así el archivo N+1 se transcribe mientras el N se analiza.
+    La etapa de análisis es asíncrona: hasta `max_concurrency` archivos pueden
+    estar subiéndose o analizándose a la vez.
+    Con `export_format` ("edl" o "fcpxml") la última etapa además compila el plan a
+    un archivo de timeline, sin necesidad de Resolve.
+    Con `subtitle_format` ("srt" o "vtt") la transcripción también genera los subtítulos.
+    `backend` y `backend_options` eligen el motor de transcripción (ver agents/backends.py).
+    Con `solo_voz` se transcriben y se suben a Gemini solo los tramos con voz; el plan,
+    los marcadores y la timeline quedan igual en el tiempo del archivo original.
+    Con `chunked` cada archivo se transcribe en ventanas solapadas en varios procesos.
+    Con `word_index` se guarda el índice de palabras de cada transcripción (ver `search`).
+    Un error en un archivo se registra en el resumen y no detiene a los demás.
+    Cada corrida exporta sus métricas (spans por etapa, RSS/CPU y contadores) a
+    workspace/reports/metricas_lote_<fecha>.json, .trace.json y .otlp.json.
+    """
+    # Falla antes de transcribir nada si falta la API key
+    genai = configurar_gemini()
+    # Subidas que una corrida anterior dejó en el servidor al cortarse
+    recolectar_subidas(REPORTS_DIR, genai)
+    cache = CacheResultados(CACHE_DIR)
+    a_analizar = queue.Queue(maxsize=queue_size)
+    a_resolve = queue.Queue(maxsize=queue_size)
+
+    resultados = {
+        path: {"archivo": os.path.basename(path), "estado": "pendiente", "etapas": {}}
+        for path in source_paths
+    }
 
-    # 2. Limpieza y Preparación del Dossier/Reporte
-    print("--- [Orquestador] Limpiando el reporte de transcripción... ---")
+    def _terminar(path, manifiesto):
+        # Un plan con ventanas fallidas (o aplicado con marcadores omitidos) llega hasta el
+        # final, pero no cuenta como completo
+        parcial = (manifiesto.etapa("plan")["estado"] == PARCIAL
+                   or (apply_resolve and manifiesto.etapa("resolve")["estado"] == PARCIAL))
+        resultados[path]["estado"] = "parcial" if parcial else "completado"
+
+    def _fallo(path, etapa, e):
+        print(f"¡ERROR! {os.path.basename(path)} falló en la etapa '{etapa}': {e}")
+        resultados[path]["estado"] = "error"
+        resultados[path]["error"] = {"etapa": etapa, "mensaje": str(e), "traceback": traceback.format_exc()}
+
+    def _medir(path, etapa, fn, *args):
+        inicio = time.perf_counter()
+        try:
+            with span(etapa, archivo=os.path.basename(path)):
+                return fn(*args)
+        finally:
+            resultados[path]["etapas"][etapa] = round(time.perf_counter() - inicio, 2)
+
+    def _hilo_transcripcion():
+        stage = _TranscriptionStage(subtitle_format, backend, backend_options, solo_voz, chunked, word_index)
+        try:
+            for path in source_paths:
+                try:
+                    job = _medir(path, "transcripcion", stage.run, path, cache)
+                except Exception as e:
+                    _fallo(path, "transcripcion", e)
+                    continue
+                if job["subtitulos"]:
+                    resultados[path]["subtitulos"] = job["subtitulos"]
+                a_analizar.put(job)
+        finally:
+            stage.close()
+            a_analizar.put(_FIN)
+
+    async def _analizar(job, client):
+        path = job["source_path"]
+        inicio = time.perf_counter()
+        try:
+            with span("analisis", archivo=job["input_filename"]):
+                plan_path = await analysis_stage(job, cache, client)
+        except Exception as e:
+            _fallo(path, "analisis", e)
+            return
+        finally:
+            resultados[path]["etapas"]["analisis"] = round(time.perf_counter() - inicio, 2)
+        resultados[path]["plan"] = plan_path
+        if apply_resolve or export_format:
+            duracion = job["clean_report"].get("duration") or 0
+            await asyncio.to_thread(a_resolve.put, (path, plan_path, duracion, job["manifiesto"]))
+        else:
+            _terminar(path, job["manifiesto"])
+
+    async def _analisis_async():
+        client = GeminiAsyncClient(max_concurrency, requests_per_minute, windowed=windowed)
+        tareas = []
+        while (job := await asyncio.to_thread(a_analizar.get)) is not _FIN:
+            tareas.append(asyncio.create_task(_analizar(job, client)))
+        await asyncio.gather(*tareas)
+
+    def _hilo_analisis():
+        try:
+            asyncio.run(_analisis_async())
+        finally:
+            a_resolve.put(_FIN)
+
+    def _hilo_resolve():
+        # Una sola conexión a Resolve para todo el lote, abierta con el primer plan. Con
+        # varios archivos cada uno va a su propia timeline (se crea si no existe)
+        sesion = None
+        varios = len(source_paths) > 1
+        while (item := a_resolve.get()) is not _FIN:
+            path, plan_path, duracion, manifiesto = item
+            # Las etapas finales se atan al contenido del plan del que salieron: un plan nuevo las rehace
+            contenido_plan = manifiesto.etapa("plan").get("contenido")
+            if export_format:
+                clave_export = f"{contenido_plan}:{export_format}:{fps}"
+                try:
+                    if manifiesto.completada("exportar", clave_export):
+                        resultados[path]["timeline"] = manifiesto.etapa("exportar")["artefacto"]
+                    else:
+                        resultados[path]["timeline"] = _medir(
+                            path, "exportar", exportar_plan, plan_path, path, duracion, export_format, fps
+                        )
+                        manifiesto.marcar("exportar", COMPLETADO, artefacto=resultados[path]["timeline"],
+                                          clave=clave_export)
+                except Exception as e:
+                    _fallo(path, "exportar", e)
+                    continue
+                if not apply_resolve:
+                    _terminar(path, manifiesto)
+                    continue
+            if manifiesto.completada("resolve", contenido_plan):
+                # Los marcadores ya están en la timeline: volver a agregarlos los duplicaría
+                print(f"--- [Orquestador] {os.path.basename(path)} ya se aplicó en Resolve. Se omite. ---")
+                resultados[path]["segmentos"] = manifiesto.etapa("resolve").get("segmentos", 0)
+                _terminar(path, manifiesto)
+                continue
+            try:
+                if sesion is None:
+                    # Import tardío: DaVinciResolveScript solo existe donde está instalado Resolve
+                    from agents import editor
+                    sesion = editor.obtener_sesion()
+                segmentos, omitidos = _medir(path, "resolve", resolve_stage, plan_path, sesion,
+                                             nombre_timeline(path), path if varios else None)
+            except Exception as e:
+                _fallo(path, "resolve", e)
+                continue
+            resultados[path]["segmentos"] = segmentos
+            # Con marcadores omitidos el plan no quedó entero en la timeline: se reintenta la próxima vez
+            manifiesto.marcar("resolve", PARCIAL if omitidos else COMPLETADO, clave=contenido_plan,
+                              segmentos=segmentos, marcadores_omitidos=omitidos)
+            _terminar(path, manifiesto)
+
+    METRICAS.reiniciar("lote")
+    METRICAS.iniciar_muestreo()
+    inicio = time.perf_counter()
+    with span("lote", archivos=len(source_paths)):
+        # Cada hilo arranca con una copia del contexto: sus spans quedan colgando de "lote"
+        hilos = [
+            threading.Thread(target=contextvars.copy_context().run, args=(objetivo,), name=nombre)
+            for objetivo, nombre in (
+                (_hilo_transcripcion, "etapa-transcripcion"),
+                (_hilo_analisis, "etapa-analisis"),
+                (_hilo_resolve, "etapa-resolve"),
+            )
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    METRICAS.detener_muestreo()
+
+    archivos = list(resultados.values())
+    resumen = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "duracion_total_s": round(time.perf_counter() - inicio, 2),
+        "total": len(archivos),
+        "completados": sum(1 for r in archivos if r["estado"] == "completado"),
+        "parciales": sum(1 for r in archivos if r["estado"] == "parcial"),
+        "fallidos": sum(1 for r in archivos if r["estado"] == "error"),
+        "archivos": archivos,
+    }
 
-    clean_report = simplify_transcription_report(full_transcription_data)
-    clean_report["input_name"] = input_filename
-    
-    # Guardar el reporte limpio para depuración
-    report_path = os.path.join(REPORTS_DIR, f"{os.path.splitext(input_filename)[0]}_dossier_limpio.json")
-    with open(report_path, 'w', encoding='utf-8') as f:
-        json.dump(clean_report, f, ensure_ascii=False, indent=4)
-    print(f"Dossier limpio para Gemini guardado en: {report_path}")
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    resumen_path = os.path.join(REPORTS_DIR, f"resumen_lote_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(resumen_path, 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=4)
+    resumen["ruta"] = resumen_path
+    resumen["metricas"] = METRICAS.exportar(REPORTS_DIR, "metricas_lote")
+    return resumen
 
-    # 3. Análisis y subida del archivo a Gemini (sea audio o video)
-    final_edit_plan = {"plan_de_edicion": []}
-    uploaded_files = {}
-   
-    try:
-        print(f"Subiendo {input_filename} a la API de Gemini...")
-        file_response = genai.upload_file(path=source_path, display_name=input_filename)
-        print(f"Archivo subido. ID: {file_response.name}. Esperando a que esté ACTIVO...")
 
-        while file_response.state.name == "PROCESSING":
-            time.sleep(5)
-            file_response = genai.get_file(name=file_response.name)
-            print(f"Estado actual de {input_filename}: {file_response.state.name}")
+# --- SUBCOMANDOS ---
 
-        if file_response.state.name != "ACTIVE":
-            raise Exception(f"La subida del archivo {input_filename} falló. Estado final: {file_response.state.name}")
+def _rutas_de_entrada(args) -> list[str]:
+    if args.rutas:
+        return [os.path.abspath(r).replace("\\", "/") for r in args.rutas]
+    return read_job_queue(args.queue) if args.queue else list_input_files(args.input)
 
-        print(f"{input_filename} está ACTIVO y listo para ser analizado.")
-        uploaded_files[input_filename] = file_response
 
-        # Llamar al Estratega para el análisis
-        clip_analysis = get_edit_plan_from_gemini(clean_report, file_response)
-        final_edit_plan["plan_de_edicion"].append(clip_analysis)
+def _backend_options(args) -> dict | None:
+    if args.backend != "faster-whisper":
+        return None
+    return {"compute_type": args.compute_type, "beam_size": args.beam_size,
+            "batch_size": args.batch_size, "cpu_threads": args.cpu_threads}
 
-    except Exception as e:
-        print(f"No se pudo procesar el archivo. Error: {e}")
 
+def cmd_transcribe(args, source_paths: list[str]) -> None:
+    """Solo transcripción y dossier (y subtítulos con --subtitles)."""
+    cache = CacheResultados(CACHE_DIR)
+    stage = _TranscriptionStage(args.subtitles, args.backend, _backend_options(args), args.solo_voz, args.chunked,
+                                args.word_index)
+    try:
+        for path in source_paths:
+            stage.run(path, cache)
     finally:
-         if file_response:
-            print("\n--- [Orquestador] Limpiando el archivo subido del servidor... ---")
-            print(f"Borrando {file_response.display_name} (ID: {file_response.name})...")
-            genai.delete_file(file_response.name)
-            print("Limpieza completada.")
+        stage.close()
+
+
+def cmd_analyze(args, source_paths: list[str]) -> None:
+    """Solo el análisis en Gemini, a partir de los dossiers que dejó `transcribe`."""
+    recolectar_subidas(REPORTS_DIR, configurar_gemini())
+    cache = CacheResultados(CACHE_DIR)
+    jobs = []
+    for path in source_paths:
+        input_filename = os.path.basename(path)
+        base_name = os.path.splitext(input_filename)[0]
+        dossier_path = os.path.join(REPORTS_DIR, f"{base_name}_dossier_limpio.json")
+        if not os.path.exists(dossier_path):
+            print(f"¡ERROR! No existe {dossier_path}. Ejecuta primero: python orchestrator.py transcribe {path}")
+            continue
+        with open(dossier_path, "r", encoding="utf-8") as f:
+            clean_report = json.load(f)
+        # El mapa de voz (si se transcribió con --solo-voz) vive en la transcripción
+        mapa_voz = None
+        transcription_path = os.path.join(REPORTS_DIR, f"{base_name}_transcription.json")
+        if os.path.exists(transcription_path):
+            with open(transcription_path, "r", encoding="utf-8") as f:
+                mapa_voz = json.load(f).get("mapa_voz")
+        huella = huella_archivo(path)
+        jobs.append({"source_path": path, "input_filename": input_filename, "base_name": base_name,
+                     "huella": huella, "clean_report": clean_report,
+                     "manifiesto": Manifiesto.cargar(REPORTS_DIR, path, huella), "mapa_voz": mapa_voz})
+
+    async def _analizar_todos():
+        client = GeminiAsyncClient(args.concurrency, args.rpm, windowed=args.windowed)
+        return await asyncio.gather(*(analysis_stage(job, cache, client) for job in jobs), return_exceptions=True)
+
+    for job, resultado in zip(jobs, asyncio.run(_analizar_todos())):
+        if isinstance(resultado, Exception):
+            print(f"¡ERROR! {job['input_filename']} falló en el análisis: {resultado}")
+
+
+def cmd_subtitle(args) -> None:
+    """Subtítulos desde transcripciones ya hechas (*_transcription.json), sin cargar Whisper."""
+    from agents.subtitulos import generar_subtitulos
+    for transcription_path in args.transcripciones:
+        with open(transcription_path, "r", encoding="utf-8") as f:
+            segmentos = json.load(f).get("dialogue_segments", [])
+        salida = transcription_path.replace("_transcription.json", f".{args.format}")
+        if salida == transcription_path:
+            salida = f"{os.path.splitext(transcription_path)[0]}.{args.format}"
+        generar_subtitulos(segmentos, salida, args.max_chars)
+
+
+def cmd_search(args) -> None:
+    """Consulta el índice de palabras de transcripciones ya hechas: una frase o un tramo de tiempo."""
+    from agents.indice_palabras import IndicePalabras, indexar_transcripcion, ruta_indice
+    from agents.timecode import segundos_desde_valor, format_ms, segundos_a_ms, ms_a_segundos
+    for transcription_path in args.transcripciones:
+        ruta = ruta_indice(transcription_path)
+        if not os.path.exists(ruta):
+            # Sin --word-index no hay índice: se arma ahora desde el JSON (sin Whisper)
+            with open(transcription_path, "r", encoding="utf-8") as f:
+                indexar_transcripcion(json.load(f).get("dialogue_segments", []), transcription_path)
+        indice = IndicePalabras.abrir(ruta)
+        try:
+            print(f"--- [Búsqueda] {os.path.basename(transcription_path)} ({len(indice)} palabras) ---")
+            if args.frase:
+                apariciones = indice.buscar_frase(args.frase)
+                for aparicion in apariciones:
+                    print(f"  {format_ms(segundos_a_ms(aparicion['start']))} --> "
+                          f"{format_ms(segundos_a_ms(aparicion['end']))}  {aparicion['text']}")
+                print(f"  {len(apariciones)} apariciones de \"{args.frase}\".")
+            if args.desde is not None or args.hasta is not None:
+                desde = segundos_desde_valor(args.desde) if args.desde is not None else 0.0
+                hasta = segundos_desde_valor(args.hasta) if args.hasta is not None else float("inf")
+                hasta = min(hasta, ms_a_segundos(int(indice.fin.max()))) if len(indice) else desde
+                print(f"  [{format_ms(segundos_a_ms(desde))} - {format_ms(segundos_a_ms(hasta))}] "
+                      f"{indice.texto_en(desde, hasta)}")
+        finally:
+            indice.cerrar()
+
+
+def cmd_apply_to_resolve(args) -> None:
+    """Aplica planes ya generados (*_edit_plan.json) en Resolve.
+
+    Un solo plan va a la timeline de su archivo si existe, o a la activa; con varios,
+    cada uno necesita una timeline con el nombre de su archivo.
+    """
+    from agents import editor
+    sesion = editor.obtener_sesion()
+    varios = len(args.planes) > 1
+    for plan_path in args.planes:
+        print(f"--- [Orquestador] Aplicando {os.path.basename(plan_path)} ---")
+        try:
+            _, omitidos = resolve_stage(plan_path, sesion, nombre_timeline(plan_path), exigir=varios)
+        except Exception as e:
+            print(f"¡ERROR! No se pudo aplicar {os.path.basename(plan_path)}: {e}")
+            continue
+        if omitidos:
+            print(f"⚠️ {omitidos} marcadores omitidos: esos frames ya tenían otro marcador.")
+
+
+def cmd_run_all(args, source_paths: list[str]) -> None:
+    """El pipeline completo por lotes."""
+    print(f"Archivos a procesar: {len(source_paths)}")
+    resumen = run_batch(source_paths, apply_resolve=not args.no_resolve,
+                        max_concurrency=args.concurrency, requests_per_minute=args.rpm,
+                        windowed=args.windowed, export_format=args.export, fps=args.fps,
+                        subtitle_format=args.subtitles, backend=args.backend,
+                        backend_options=_backend_options(args), solo_voz=args.solo_voz, chunked=args.chunked,
+                        word_index=args.word_index)
 
-    # 4. Guardar el Plan de Edición Final
-    plan_path = os.path.join(REPORTS_DIR, f"{os.path.splitext(input_filename)[0]}_edit_plan.json")
-    with open(plan_path, 'w', encoding='utf-8') as f:
-        json.dump(final_edit_plan, f, ensure_ascii=False, indent=4)
-        
     print(f"\n--- PROCESO COMPLETADO ---")
-    print(f"El plan de edición multimodal ha sido guardado en: {plan_path}")
-
+    print(f"{resumen['completados']}/{resumen['total']} archivos completados, {resumen['parciales']} parciales, "
+          f"{resumen['fallidos']} con errores.")
+    for r in resumen["archivos"]:
+        detalle = f" ({r['error']['etapa']}: {r['error']['mensaje']})" if r["estado"] == "error" else ""
+        print(f"  - {r['archivo']}: {r['estado']}{detalle}")
+    print(f"Resumen del lote guardado en: {resumen['ruta']}")
+    print(f"Traza de la corrida (chrome://tracing o Perfetto): {resumen['metricas']['chrome']}")
+
+
+COMANDOS = ("transcribe", "analyze", "subtitle", "search", "apply-to-resolve", "run-all")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Pipeline de transcripción, análisis y edición por lotes.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    entrada = argparse.ArgumentParser(add_help=False)
+    entrada.add_argument("rutas", nargs="*", help="Archivos a procesar (por defecto, todo input/).")
+    entrada.add_argument("--input", default=INPUT_DIR, help="Carpeta con los archivos a procesar (por defecto input/).")
+    entrada.add_argument("--queue", help="Archivo de cola de trabajos con una ruta por línea (reemplaza a --input).")
+
+    transcripcion = argparse.ArgumentParser(add_help=False)
+    transcripcion.add_argument("--subtitles", choices=SUBTITLE_FORMATS, help="Generar subtítulos SRT o VTT desde los tiempos por palabra de Whisper.")
+    transcripcion.add_argument("--solo-voz", action="store_true", help="Saltear los silencios largos: transcribir y subir a Gemini solo los tramos con voz.")
+    transcripcion.add_argument("--word-index", action="store_true", help="Guardar el índice de palabras de cada transcripción (para `search`).")
+    transcripcion.add_argument("--chunked", action="store_true", help="Transcribir cada archivo en ventanas solapadas en varios procesos (grabaciones largas).")
+    transcripcion.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Motor de transcripción.")
+    transcripcion.add_argument("--compute-type", help="Cuantización de faster-whisper: int8, int8_float16, float16, float32...")
+    transcripcion.add_argument("--beam-size", type=int, default=BEAM_SIZE, help="Beam size de faster-whisper.")
+    transcripcion.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Lote de decodificación de faster-whisper (1 = secuencial).")
+    transcripcion.add_argument("--cpu-threads", type=int, default=CPU_THREADS, help="Hilos de CPU de faster-whisper (0 = automático).")
+
+    analisis = argparse.ArgumentParser(add_help=False)
+    analisis.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Archivos en vuelo a la vez en Gemini.")
+    analisis.add_argument("--windowed", action="store_true", help="Analizar el video por ventanas en paralelo (videos largos).")
+    analisis.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE, help="Máximo de llamadas a la API de Gemini por minuto.")
+
+    subparsers.add_parser("transcribe", parents=[entrada, transcripcion],
+                          help="Transcribir y preparar el dossier (sin Gemini ni Resolve).")
+    subparsers.add_parser("analyze", parents=[entrada, analisis],
+                          help="Pedir el plan a Gemini a partir de los dossiers ya generados.")
+
+    subtitulos = subparsers.add_parser("subtitle", help="Generar subtítulos desde *_transcription.json (sin Whisper).")
+    subtitulos.add_argument("transcripciones", nargs="+", help="Archivos *_transcription.json.")
+    subtitulos.add_argument("--format", choices=SUBTITLE_FORMATS, default="srt")
+    subtitulos.add_argument("--max-chars", type=int, help="Caracteres por línea (por defecto, los de config.json).")
+
+    busqueda = subparsers.add_parser("search", help="Buscar una frase o leer un tramo en *_transcription.json (con su índice de palabras).")
+    busqueda.add_argument("transcripciones", nargs="+", help="Archivos *_transcription.json.")
+    busqueda.add_argument("--frase", help="Frase a buscar (sin distinguir mayúsculas ni acentos).")
+    busqueda.add_argument("--desde", help="Inicio del tramo a leer (segundos, mm:ss o hh:mm:ss).")
+    busqueda.add_argument("--hasta", help="Fin del tramo a leer.")
+
+    resolve = subparsers.add_parser("apply-to-resolve", help="Aplicar planes *_edit_plan.json en DaVinci Resolve.")
+    resolve.add_argument("planes", nargs="+", help="Archivos *_edit_plan.json.")
+
+    todo = subparsers.add_parser("run-all", parents=[entrada, transcripcion, analisis],
+                                 help="Pipeline completo por lotes (opción por defecto).")
+    todo.add_argument("--no-resolve", action="store_true", help="No aplicar los planes en DaVinci Resolve.")
+    todo.add_argument("--export", choices=FORMATOS, help="Compilar cada plan a una timeline EDL o FCPXML (no requiere Resolve).")
+    todo.add_argument("--fps", type=float, default=FPS_DEFAULT, help="Frame rate del proyecto para el timecode de --export.")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    # Sin subcomando se mantiene el comportamiento anterior: el pipeline completo
+    if not argv or argv[0] not in COMANDOS + ("-h", "--help"):
+        argv = ["run-all", *argv]
+    args = build_parser().parse_args(argv)
+
+    if args.comando == "subtitle":
+        return cmd_subtitle(args)
+    if args.comando == "search":
+        return cmd_search(args)
+    if args.comando == "apply-to-resolve":
+        return cmd_apply_to_resolve(args)
+
+    source_paths = _rutas_de_entrada(args)
+    if not source_paths:
+        print(f"¡ERROR! No se encontró ningún archivo en {args.queue or args.input}")
+        return
+    {"transcribe": cmd_transcribe, "analyze": cmd_analyze, "run-all": cmd_run_all}[args.comando](args, source_paths)
 
-    # ACÁ LO UNO CON editor.py
 
-    #éste bloque lee el plan de edición que ya generaste
-    #Extraer los segmentos con timestamps (start y end).
-    #Manda esos timestamps a editor.py para que:
-    #Cree marcadores en la timeline de Resolve y haga cortes en esos puntos.
-
-    # . Aplicar plan en DaVinci Resolve
-from agents import editor
-
-with open(plan_path, "r", encoding="utf-8") as f:
-    plan = json.load(f)
-
-# Suponiendo que el plan tiene segmentos con "start" y "end"
-segments = plan["plan_de_edicion"][0].get("segments", [])
-
-if segments:
-    print("--- [Orquestador] Creando marcadores en Resolve ---")
-    editor.agregar_marcadores(
-        [{"time": s["start"], "label": f"Inicio {i+1}"} for i, s in enumerate(segments)]
-        + [{"time": s["end"], "label": f"Fin {i+1}"} for i, s in enumerate(segments)]
-    )
-
-    print("--- [Orquestador] Haciendo cortes en Resolve ---")
-    editor.hacer_cortes(segments)
+# --- Bloque principal ---
+if __name__ == '__main__':
+    main()